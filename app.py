@@ -1,19 +1,195 @@
 import streamlit as st
 import pandas as pd
-import json
+import orjson
 import os
-import tempfile
 import base64
-import requests
+import hashlib
+import functools
 import re
-from medical_researcher_agent import MedicalResearcherAgent
-from dotenv import load_dotenv
+import secrets
 import openai
+from medical_researcher_agent import (MedicalResearcherAgent, PROFILE_MAX_TOKENS, PROFILE_MODEL, PROFILE_RESPONSE_FORMAT,
+                                      PROFILE_RETRY_MAX_TOKENS, SEARCH_URLS, SYNTH_MODEL, URL_OK, clean_profile,
+                                      create_http_session, create_openai_client, is_sparse_profile, search_url)
+from pubmed_cache import prefetch_pmids, lookup_pmids
+import response_cache
+from dotenv import load_dotenv
 import time
+from collections import Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait
 
 
 load_dotenv()
 
+# Article page used when a publication's PubMed ID is known
+PUBMED_ARTICLE_URL = "https://pubmed.ncbi.nlm.nih.gov/{}/"
+
+# Model for chat answers. Profile lookups use the agent's PROFILE_MODEL and SYNTH_MODEL.
+CHAT_MODEL = "gpt-4o-mini"
+
+# Publication lists at least this long are checked for missing links with pandas instead of a Python loop
+VECTORIZE_MIN_ITEMS = 50
+
+# System prompts for the full-profile lookup and for single-field lookups
+PROFILE_SYSTEM_PROMPT = """You are a research assistant specializing in medical research. Search for and provide the most accurate \
+information about medical researchers in JSON format. Respond with a single JSON object. Focus on precision, \
+especially for links to publications, educational background details, and clinical trial information. \
+All links must be real, working URLs.
+
+The user names a medical researcher and, optionally, their specialization. Search the web for the most accurate and \
+up-to-date information about them, and provide:
+1. A summary of their background and expertise
+2. Their key research contributions
+3. Their affiliations (current and past with years if available)
+4. Research interests
+5. Notable publications with EXACT LINKS to PubMed, Google Scholar, or original sources
+6. Educational background and degrees (universities, years, and degrees obtained)
+7. Any clinical trials they're involved in with DIRECT LINKS to ClinicalTrials.gov or other source websites
+
+For publications and clinical trials, it's CRUCIAL to include direct, working links to the source pages.
+For educational background, please be thorough and include complete information about degrees, institutions, and years.
+
+Format the response as a JSON with these keys:
+- basic_info (object with fields like email, phone if available)
+- summary (string)
+- key_contributions (string)
+- education (array of strings, each with institution, degree, and year if available)
+- affiliations (array of strings, each with institution and position)
+- research_interests (array of strings)
+- publications (array of objects with title, authors, journal, year, and url fields)
+- clinical_trials (array of objects with title, status, condition, and url fields)
+
+For all URLs, verify they are valid and directly point to the relevant resources."""
+
+FIELD_SYSTEM_PROMPT = (
+    "You are a research assistant specializing in finding specific information about medical researchers. "
+    "Provide accurate, factual information in JSON format. Respond with a single JSON object. Ensure all URLs "
+    "are direct links to relevant pages and all educational/affiliation details are complete."
+)
+
+# System prompts and prompt templates for chat questions about the current researcher
+CHAT_SYSTEM_PROMPT = (
+    "You are a helpful research assistant specializing in medical researchers. Provide accurate, comprehensive "
+    "answers about medical researchers based on available information. Include links when available, especially "
+    "for publications and clinical trials.\n\n"
+    "Please provide a detailed, factual answer based on the information provided in the context. "
+    "If the context doesn't contain sufficient information to fully answer the question, "
+    "explicitly state this and then provide your best estimate of the answer based on general knowledge. "
+    "When referencing publications, clinical trials, educational background, or affiliations, "
+    "include direct links when available."
+)
+WEB_SYSTEM_PROMPT = (
+    "You are a research assistant with web search capabilities. Find specific information about medical "
+    "researchers by searching the provided websites."
+)
+# The researcher context comes before the question, so follow-up questions share the longest possible prefix
+CHAT_PROMPT_TEMPLATE = """
+{context}
+
+Question about {name}: {question}
+"""
+WEB_PROMPT_TEMPLATE = """
+I need specific information about {name} to answer this question: {question}
+
+I should search these websites for information:
+{websites}
+
+Please search for factual information to answer the question, and provide only
+verified information with source links when possible.
+"""
+
+SUGGESTED_PROMPT_TEMPLATE = """
+{context}
+
+Answer each of these questions about {name}:
+{questions}
+
+Base each answer on the information provided in the context, and say so when you go beyond it.
+Include direct links when available. Respond with a single JSON object whose keys are the
+question ids (q1, q2, ...) and whose values are the markdown answers.
+"""
+
+# Formatting rules for each field we may ask OpenAI to look up on its own
+FIELD_INSTRUCTIONS = {
+    "clinical_trials": """
+        For clinical trials, provide direct links to ClinicalTrials.gov or other official trial registry pages.
+        Each clinical trial should include title, status, condition, and a direct URL to the specific trial page.
+        Validate all URLs to ensure they point to actual clinical trial registry pages.
+        """,
+    "publications": """
+        For publications, provide direct links to PubMed, journal pages, or Google Scholar links for each publication.
+        Each publication should include title, authors, journal, year, and a direct URL to the specific publication page.
+        Validate all URLs to ensure they point to actual publication pages.
+        """,
+    "education": """
+        For education, provide detailed information about each degree earned, including:
+        - Degree type (e.g., MD, PhD, MS, BA)
+        - Institution name
+        - Year awarded
+        - Field of study
+        Return this as an array of strings, with each string containing the complete information for one degree.
+        """,
+    "affiliations": """
+        For affiliations, provide detailed information about each institutional affiliation, including:
+        - Institution name
+        - Position/title held
+        - Years of employment (if available)
+        - Department or division (if available)
+        Return this as an array of strings, with each string containing the complete information for one affiliation.
+        """,
+    "research_interests": """
+        For research interests, list the specific research interests and focus areas.
+        Return this as an array of strings, with each string describing one interest.
+        """,
+}
+
+# Built-in sources, as opposed to websites the user added
+KNOWN_SOURCES = frozenset({"pubmed", "researchgate", "google_scholar", "clinical_trials"})
+
+# Sections of a researcher profile, one shown at a time
+PROFILE_SECTIONS = ("Publications", "Clinical Trials", "Education", "Affiliations", "Research Interests", "Other Info")
+
+# Questions offered under the chat, answered just like typed questions
+SUGGESTED_QUESTIONS = (
+    "What are their main research interests?",
+    "What are their key achievements?",
+    "What clinical trials are they involved in?",
+    "What is their educational background? Where did they study?",
+)
+
+# Markdown prefixes for numbered lists, formatted once rather than for every item
+NUM_PREFIXES = tuple(f"**{i}.** " for i in range(1, 256))
+
+# Profile sections reported while a search is in progress
+SECTIONS = ("publications", "clinical_trials", "education", "affiliations", "research_interests")
+
+# Seconds between automatic status checks of a submitted CSV batch job, and the statuses that end it
+BATCH_POLL_INTERVAL = 60
+BATCH_DONE_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Seconds the primary search may run before the OpenAI fallback is started alongside it
+HEDGE_DELAY = 5.0
+
+# Minimum seconds between progress redraws while a response is streaming
+STREAM_FLUSH_INTERVAL = 0.08
+
+# Trailing characters of a streaming JSON reply shown in its preview
+STREAM_PREVIEW_CHARS = 1500
+
+# Phrases in a chat answer that mean the researcher context didn't cover the question
+MISSING_INFO_RE = re.compile(
+    r"context doesn['’]t contain|information isn['’]t in the provided context|no information in the context"
+    r"|I don['’]t have specific information|context doesn['’]t provide|don['’]t have that information",
+    re.IGNORECASE
+)
+
+# Characters and line prefixes that only render correctly as markdown
+MARKDOWN_RE = re.compile(r'[*_`#\[\]<>|~]|^\s*(?:[-+]|\d+\.)\s', re.MULTILINE)
+
+# Minimum seconds between redraws of a chat answer, which re-parse the whole markdown buffer
+CHAT_FLUSH_INTERVAL = 0.1
+
 # Page configuration
 st.set_page_config(
     page_title="Medical Researcher Search Agent",
@@ -21,319 +197,643 @@ st.set_page_config(
     layout="wide"
 )
 
+# Encoding is cached per file version (keyed on mtime) so reruns skip the disk read
+@st.cache_data(show_spinner=False)
+def _encoded_file(file_path, mtime):
+    with open(file_path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('ascii')
+
 # Function to create a download link for a file
 def get_download_link(file_path, link_text):
-    with open(file_path, 'r') as f:
-        data = f.read()
-    b64 = base64.b64encode(data.encode()).decode()
+    b64 = _encoded_file(file_path, os.path.getmtime(file_path))
     href = f'<a href="data:file/csv;base64,{b64}" download="{os.path.basename(file_path)}">{link_text}</a>'
     return href
 
-# Function to search for researcher with error handling and fallback
-def search_researcher_with_fallback(agent, name, specialization=None):
+# Function to name the OpenAI prompt-cache bucket for a system prompt, so calls that share
+# the same static prefix are routed to the same cache
+@functools.lru_cache(maxsize=None)
+def prompt_cache_key(system_prompt):
+    return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()
+
+# Function to stream a JSON chat completion while previewing it, returning the full text and
+# the finish reason ("length" when max_tokens cut the reply off).
+# Preview redraws are throttled so Streamlit isn't re-rendering on every token, and only show
+# the end of the reply so each redraw stays small however long the reply gets.
+# Calls from background threads pass show_progress=False, since they can't draw Streamlit elements.
+def stream_chat_completion(client, show_progress=True, **kwargs):
+    placeholder = st.empty() if show_progress else None
+    parts = []
+    finish_reason = None
+    last_flush = 0.0
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        parts.append(chunk.choices[0].delta.content or "")
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        now = time.monotonic()
+        if placeholder is not None and now - last_flush >= STREAM_FLUSH_INTERVAL:
+            received = "".join(parts)
+            parts = [received]
+            preview = received if len(received) <= STREAM_PREVIEW_CHARS else "…" + received[-STREAM_PREVIEW_CHARS:]
+            placeholder.code(preview, language="json")
+            last_flush = now
+    if placeholder is not None:
+        placeholder.empty()
+    return "".join(parts), finish_reason
+
+# Function to stream a chat completion's text for st.write_stream. Tokens are coalesced
+# so the answer is redrawn at most once per CHAT_FLUSH_INTERVAL rather than per token.
+def stream_text(client, **kwargs):
+    parts = []
+    last_flush = time.monotonic()
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        parts.append(chunk.choices[0].delta.content or "")
+        now = time.monotonic()
+        if now - last_flush >= CHAT_FLUSH_INTERVAL:
+            yield "".join(parts)
+            parts.clear()
+            last_flush = now
+    if parts:
+        yield "".join(parts)
+
+# Function to build a chat history entry, noting once whether its content needs markdown rendering
+def chat_entry(role, content):
+    return {"role": role, "content": content, "markdown": bool(MARKDOWN_RE.search(content))}
+
+# Function to key a chat answer on the researcher, the question as asked (ignoring case, spacing and
+# the trailing question mark) and the context it was answered from, so a changed context isn't served stale answers
+def answer_cache_key(researcher_name, question, context):
+    normalized = " ".join(question.lower().split()).rstrip("?")
+    return hashlib.blake2b(f"{researcher_name}\0{normalized}\0{context}".encode("utf-8"), digest_size=16).hexdigest()
+
+# Functions to keep each researcher's conversation on disk, so a browser refresh doesn't lose it.
+# Conversations are keyed by this browser's chat_owner id as well, so nobody else sees them.
+def load_chat_history(researcher_name):
+    cached = response_cache.get(response_cache.make_key("chat", st.session_state.chat_owner, researcher_name))
+    return orjson.loads(cached) if cached else None
+
+def save_chat_history():
+    response_cache.put(response_cache.make_key("chat", st.session_state.chat_owner, st.session_state.current_researcher),
+                       orjson.dumps(st.session_state.chat_history).decode())
+
+# Function to build a search URL for a publication or clinical trial that has no direct link
+def fallback_url(title, kind, pmid=None):
+    if pmid:
+        return PUBMED_ARTICLE_URL.format(pmid)
+    return search_url(title, kind)
+
+# Function to pick out the items that have a title but no usable link.
+# CSV data lists publications as plain titles, which have nowhere to store a link.
+def unlinked_items(items):
+    items = [item for item in items if isinstance(item, dict)]
+    if len(items) < VECTORIZE_MIN_ITEMS:
+        return [item for item in items if item.get('title')
+                and not (item.get('url') and URL_OK.match(str(item['url'])))]
+    
+    # Only the mask is computed in pandas; the dicts themselves are updated in place,
+    # so a records round-trip can't leak NaN into fields some items don't have
+    df = pd.DataFrame(items, columns=['title', 'url'])
+    has_title = df['title'].notna() & df['title'].astype(bool)
+    has_link = df['url'].fillna('').astype(str).str.match(URL_OK)
+    return [items[i] for i in (has_title & ~has_link).to_numpy().nonzero()[0]]
+
+# Function to give publications and clinical trials without a usable link a direct or search URL
+def fill_missing_links(data):
+    for kind in SEARCH_URLS:
+        unlinked = unlinked_items(data.get(kind) or ())
+        if not unlinked:
+            continue
+        pmids = lookup_pmids(item['title'] for item in unlinked) if kind == "publications" else {}
+        for item in unlinked:
+            item['url'] = fallback_url(item['title'], kind, pmids.get(item['title']))
+    return data
+
+# Shared worker pool for background OpenAI calls, which may outlive the rerun that started them
+@st.cache_resource
+def get_background_executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+# Shared worker pool for primary searches, so a search that runs long can be hedged with the fallback
+@st.cache_resource
+def get_search_executor():
+    return ThreadPoolExecutor(max_workers=8)
+
+# How often the delayed speculative fallback was not started, started but discarded, or used,
+# to judge whether HEDGE_DELAY is set well
+@st.cache_resource
+def get_hedge_stats():
+    return Counter()
+
+# Function to search for researcher, reusing a profile found in the last few hours even across
+# browser refreshes and restarts. Yields the same (field, value) pairs as _search_researcher_stream.
+def search_researcher_stream(agent, name, specialization=None, sources=None):
+    # the sources, any loaded CSV and any batch profiles decide what a search can find, so they are part of the key
+    sources = sources or agent.sources
+    cache_key = response_cache.make_key("researcher", name, specialization, sorted(sources.items()),
+                                        agent.data_fingerprint())
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        researcher_data = orjson.loads(cached)
+        for key in SECTIONS:
+            if researcher_data.get(key):
+                yield key, researcher_data[key]
+        yield "result", (researcher_data, None)
+        return
+    
+    for field, value in _search_researcher_stream(agent, name, specialization, sources):
+        if field == "result" and value[0] and not value[1]:
+            response_cache.put(cache_key, orjson.dumps(value[0], option=orjson.OPT_SERIALIZE_NUMPY).decode())
+        yield field, value
+
+# Function to search for researcher with error handling and fallback.
+# Yields (field, value) pairs as each profile section becomes available, then a final
+# ("result", (researcher_data, error)) pair once the search is complete.
+def _search_researcher_stream(agent, name, specialization, sources):
+    hedge = None
+    hedge_stats = get_hedge_stats()
+    
     try:
-        # First try the normal search
-        result = agent.search_researcher(name, specialization)
+        # First try the normal search, which the session's agent keeps in its own LRU cache.
+        # The OpenAI fallback is not started with it: only once the search has run HEDGE_DELAY seconds
+        # is the fallback started speculatively alongside it, so searches that finish sooner never pay for it.
+        primary = get_search_executor().submit(agent.search_researcher, name, specialization, sources=sources)
+        if agent.openai_api_key and not wait([primary], timeout=HEDGE_DELAY).done:
+            hedge = get_background_executor().submit(
+                get_researcher_info_from_openai, agent.client, name, specialization, show_progress=False
+            )
+        result = primary.result()
+        for key in SECTIONS:
+            if result.get(key):
+                yield key, result[key]
         
         # Check if we actually found meaningful information
-        has_meaningful_data = (
-            result.get('publications') or 
-            result.get('affiliations') or 
-            result.get('research_interests') or 
-            (result.get('basic_info') and len(result.get('basic_info')) > 0)
-        )
-        
-        # Make secondary requests for specific information types that might be missing
-        if not result.get('clinical_trials') and 'clinical_trials' in agent.sources:
-            try:
-                print(f"Making a targeted search for clinical trials by {name}")
-                specific_query = f"{name} clinical trial investigator"
-                if agent.openai_api_key:
-                    trials_info = get_specific_researcher_info(
-                        agent.openai_api_key, 
-                        name, 
-                        "clinical_trials",
-                        f"Find clinical trials where {name} is an investigator or contributor. Include DIRECT LINKS to ClinicalTrials.gov or other sources."
-                    )
-                    if trials_info and trials_info.get('clinical_trials'):
-                        result['clinical_trials'] = trials_info.get('clinical_trials')
-            except Exception as e:
-                print(f"Error in targeted clinical trials search: {e}")
-        
-        
-        if not result.get('education'):
-            try:
-                print(f"Making a targeted search for educational background of {name}")
-                if agent.openai_api_key:
-                    education_info = get_specific_researcher_info(
-                        agent.openai_api_key, 
-                        name, 
-                        "education",
-                        f"Find detailed educational background of {name}, including degrees, institutions, and years if available."
-                    )
-                    if education_info and education_info.get('education'):
-                        result['education'] = education_info.get('education')
-            except Exception as e:
-                print(f"Error in targeted education search: {e}")
-        
-        
-        if not result.get('affiliations'):
-            try:
-                print(f"Making a targeted search for affiliations of {name}")
-                if agent.openai_api_key:
-                    affiliations_info = get_specific_researcher_info(
-                        agent.openai_api_key, 
-                        name, 
-                        "affiliations",
-                        f"Find current and past institutional affiliations of {name}, including positions held."
-                    )
-                    if affiliations_info and affiliations_info.get('affiliations'):
-                        result['affiliations'] = affiliations_info.get('affiliations')
-            except Exception as e:
-                print(f"Error in targeted affiliations search: {e}")
+        has_meaningful_data = agent.has_meaningful_data(result)
         
-       
-        if not result.get('research_interests'):
-            try:
-                print(f"Making a targeted search for research interests of {name}")
-                if agent.openai_api_key:
-                    interests_info = get_specific_researcher_info(
-                        agent.openai_api_key, 
-                        name, 
-                        "research_interests",
-                        f"List the specific research interests and focus areas of {name}"
-                    )
-                    if interests_info and interests_info.get('research_interests'):
-                        result['research_interests'] = interests_info.get('research_interests')
-            except Exception as e:
-                print(f"Error in targeted research interests search: {e}")
-        
-        # validating publication links if present
-        if result.get('publications'):
-            for pub in result['publications']:
-                if not pub.get('url') or not pub['url'].startswith(('http://', 'https://')):
-                    if pub.get('title'):
-                        # Create PubMed search URL if no direct link is available
-                        search_title = pub['title'].replace(' ', '+')
-                        pub['url'] = f"https://pubmed.ncbi.nlm.nih.gov/?term={search_title}"
+        # Ask for every field that is still missing in a single OpenAI call
+        if agent.openai_api_key:
+            has_trials_source = 'clinical_trials' in sources
+            missing = [
+                key for key in ("clinical_trials", "education", "affiliations", "research_interests")
+                if not result.get(key) and (key != 'clinical_trials' or has_trials_source)
+            ]
+            if missing:
+                print(f"Making a targeted search for {', '.join(missing)} of {name}")
+                try:
+                    missing_info = get_missing_fields(agent.client, name, missing)
+                except openai.RateLimitError:
+                    # the client has already retried with backoff; keep what the sources found
+                    # rather than losing the whole search
+                    print(f"Rate limited looking up {', '.join(missing)} of {name}")
+                    missing_info = {}
+                for key in missing:
+                    if missing_info.get(key):
+                        result[key] = missing_info[key]
+                        yield key, result[key]
         
-        # validating clinical trial links if present
-        if result.get('clinical_trials'):
-            for trial in result['clinical_trials']:
-                if not trial.get('url') or not trial['url'].startswith(('http://', 'https://')):
-                    if trial.get('title'):
-                        # Create ClinicalTrials.gov search URL if no direct link is available
-                        search_title = trial['title'].replace(' ', '+')
-                        trial['url'] = f"https://clinicaltrials.gov/search?term={search_title}"
+        # giving publications and clinical trials without a usable link a search URL
+        fill_missing_links(result)
         
         if has_meaningful_data:
-            return result, None
+            if hedge:
+                # cancel() only helps while the call is queued; once running it is paid for regardless
+                hedge.cancel()
+                hedge_stats["discarded"] += 1
+            else:
+                hedge_stats["not_started"] += 1
+            yield "result", (result, None)
         else:
             print(f"No meaningful data found for {name}, trying fallback...")
             
-           
-            fallback_info = get_researcher_info_from_openai(agent.openai_api_key, name, specialization)
+            if hedge:
+                hedge_stats["used"] += 1
+                print(f"Speculative fallback used in {hedge_stats['used']} of "
+                      f"{hedge_stats['used'] + hedge_stats['discarded']} searches that started it")
+            try:
+                fallback_info = hedge.result() if hedge else get_researcher_info_from_openai(agent.client, name, specialization)
+            except Exception as e:
+                # fall through to whatever partial data the sources returned, rather than
+                # letting the handler below ask for the same failing fallback again
+                print(f"Error looking up {name} with OpenAI: {str(e)}")
+                fallback_info = None
             if fallback_info:
                 for key, value in fallback_info.items():
                     if key not in result or not result[key]:
                         result[key] = value
-                return result, None
-            
-            if result.get('name'):
-                return result, "Limited information found. Please try a different researcher."
+                        if key in SECTIONS and value:
+                            yield key, value
+                yield "result", (fill_missing_links(result), None)
+            elif result.get('name'):
+                yield "result", (result, "Limited information found. Please try a different researcher.")
             else:
-                return None, f"Could not find information about {name}. Please try another name or check spelling."
+                yield "result", (None, f"Could not find information about {name}. Please try another name or check spelling.")
     except Exception as e:
         try:
-            fallback_info = get_researcher_info_from_openai(agent.openai_api_key, name, specialization)
-            return fallback_info, None
+            if hedge:
+                fallback_info = hedge.result()
+            else:
+                fallback_info = get_researcher_info_from_openai(agent.client, name, specialization)
+            yield "result", (fill_missing_links(fallback_info), None)
         except Exception as e2:
-            return None, f"Could not retrieve information: {str(e2)}"
+            yield "result", (None, f"Could not retrieve information: {str(e2)}")
 
-def get_researcher_info_from_openai(api_key, name, specialization=None):
-    openai.api_key = api_key
+def get_researcher_info_from_openai(client, name, specialization=None, show_progress=True):
+    # the smaller model handles most lookups; the larger one is only asked when its profile comes back thin
+    researcher_data = _cached_researcher_info(client, name, specialization, PROFILE_MODEL, show_progress)
+    if is_sparse_profile(researcher_data):
+        print(f"{PROFILE_MODEL} profile of {name} is sparse, asking {SYNTH_MODEL}")
+        researcher_data = _cached_researcher_info(client, name, specialization, SYNTH_MODEL, show_progress)
+    return researcher_data
+
+# Cached so reruns and repeat searches don't re-issue the same call.
+# The client and show_progress are kept out of the cache key; failures raise and are never cached.
+@st.cache_data(ttl=86400, max_entries=512, show_spinner=False)
+def _cached_researcher_info(_client, name, specialization, model, _show_progress=True):
+    # Only the researcher goes in the user message, so the long instructions in the
+    # system prompt form an identical prefix that OpenAI can serve from its prompt cache
+    prompt = f"Researcher: {name}\nSpecialization: {specialization or 'not specified'}"
     
-    spec_text = f" who specializes in {specialization}" if specialization else ""
-    
-    prompt = f"""
-    I need comprehensive information about medical researcher {name}{spec_text}.
-    Please search the web for the most accurate and up-to-date information, and provide:
-    1. A summary of their background and expertise
-    2. Their key research contributions
-    3. Their affiliations (current and past with years if available)
-    4. Research interests
-    5. Notable publications with EXACT LINKS to PubMed, Google Scholar, or original sources
-    6. Educational background and degrees (universities, years, and degrees obtained)
-    7. Any clinical trials they're involved in with DIRECT LINKS to ClinicalTrials.gov or other source websites
-    
-    For publications and clinical trials, it's CRUCIAL to include direct, working links to the source pages.
-    For educational background, please be thorough and include complete information about degrees, institutions, and years.
-    
-    Format the response as a JSON with these keys:
-    - basic_info (object with fields like email, phone if available)
-    - summary (string)
-    - key_contributions (string)
-    - education (array of strings, each with institution, degree, and year if available)
-    - affiliations (array of strings, each with institution and position)
-    - research_interests (array of strings)
-    - publications (array of objects with title, authors, journal, year, and url fields)
-    - clinical_trials (array of objects with title, status, condition, and url fields)
-    
-    For all URLs, verify they are valid and directly point to the relevant resources.
-    """
+    # Replies are also kept on disk for a few hours, so repeat lookups survive app restarts
+    cache_key = response_cache.make_key("profile", name, specialization, model)
+    cached = response_cache.get(cache_key)
     
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a research assistant specializing in medical research. Search for and provide the most accurate information about medical researchers in JSON format. Focus on precision, especially for links to publications, educational background details, and clinical trial information. All links must be real, working URLs."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        
-        content = response.choices[0].message.content
-        
-
-        json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-        if json_match:
-            content = json_match.group(1)
+        content = cached
+        if content is None:
+            # a reply cut off at the cap isn't valid JSON, so it is asked for once more with room to finish
+            for max_tokens in (PROFILE_MAX_TOKENS, PROFILE_RETRY_MAX_TOKENS):
+                content, finish_reason = stream_chat_completion(
+                    _client,
+                    show_progress=_show_progress,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": PROFILE_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    prompt_cache_key=prompt_cache_key(PROFILE_SYSTEM_PROMPT),
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    response_format=PROFILE_RESPONSE_FORMAT
+                )
+                if finish_reason != "length":
+                    break
+                print(f"{model} profile of {name} was cut off at {max_tokens} tokens")
+            else:
+                raise ValueError(f"OpenAI profile of {name} is longer than {PROFILE_RETRY_MAX_TOKENS} tokens")
         
-        researcher_data = json.loads(content)
+        researcher_data = orjson.loads(content)
+        if cached is None:
+            response_cache.put(cache_key, content)
         
+        clean_profile(researcher_data)
         researcher_data["name"] = name
         researcher_data["specialization"] = specialization
         researcher_data["ai_generated"] = True
         researcher_data["source_urls"] = {"ai_generated": "Generated using OpenAI with web search"}
         
-        # Process and validate publication URLs
-        if "publications" in researcher_data:
-            for pub in researcher_data["publications"]:
-                # ensuring URL exists and is properly formatted
-                if "url" not in pub or not pub["url"] or not pub["url"].startswith(("http://", "https://")):
-                    # trying to construct a search URL if  missing...just too see and test whether streamlit can show hyperlinks
-                    if "title" in pub and pub["title"]:
-                        pub_title = pub["title"].replace(" ", "+")
-                        pub["url"] = f"https://pubmed.ncbi.nlm.nih.gov/?term={pub_title}"
-        
-        # Process and validate clinical trial URLs
-        if "clinical_trials" in researcher_data:
-            for trial in researcher_data["clinical_trials"]:
-                # ensuring URL exists and is properly formatted
-                if "url" not in trial or not trial["url"] or not trial["url"].startswith(("http://", "https://")):
-                    # adding a default clinical trials search if URL is missing ...for streamlit visuals
-                    if "title" in trial and trial["title"]:
-                        trial_title = trial["title"].replace(" ", "+")
-                        trial["url"] = f"https://clinicaltrials.gov/search?term={trial_title}"
-        
         return researcher_data
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"OpenAI returned invalid JSON: {e}") from e
+
+# Function to look up several missing fields about a researcher in one OpenAI call
+# Rate limits are raised once the client's own retries with backoff are used up, so the
+# caller can tell them apart and keep what the sources found.
+def get_missing_fields(client, name, missing, model=PROFILE_MODEL):
+    try:
+        return _cached_missing_fields(client, name, tuple(missing), model)
+    except openai.RateLimitError:
+        raise
     except Exception as e:
-        raise e
+        print(f"Error getting missing researcher info: {str(e)}")
+        return {}
 
-# Function to get specific information about a researcher
-def get_specific_researcher_info(api_key, name, info_type, specific_query):
-    """Get specific types of information about a researcher using OpenAI."""
-    openai.api_key = api_key
-    
-    # Customize the prompt based on the information type....we can if we want....bla bla
-    if info_type == "clinical_trials":
-        type_instructions = """
-        For clinical trials, provide direct links to ClinicalTrials.gov or other official trial registry pages.
-        Each clinical trial should include title, status, condition, and a direct URL to the specific trial page.
-        Validate all URLs to ensure they point to actual clinical trial registry pages.
-        """
-    elif info_type == "publications":
-        type_instructions = """
-        For publications, provide direct links to PubMed, journal pages, or Google Scholar links for each publication.
-        Each publication should include title, authors, journal, year, and a direct URL to the specific publication page.
-        Validate all URLs to ensure they point to actual publication pages.
-        """
-    elif info_type == "education":
-        type_instructions = """
-        For education, provide detailed information about each degree earned, including:
-        - Degree type (e.g., MD, PhD, MS, BA)
-        - Institution name
-        - Year awarded
-        - Field of study
-        Return this as an array of strings, with each string containing the complete information for one degree.
-        """
-    elif info_type == "affiliations":
-        type_instructions = """
-        For affiliations, provide detailed information about each institutional affiliation, including:
-        - Institution name
-        - Position/title held
-        - Years of employment (if available)
-        - Department or division (if available)
-        Return this as an array of strings, with each string containing the complete information for one affiliation.
-        """
-    else:
-        type_instructions = f"Provide specific information about {info_type}, formatted as an array of strings or appropriate JSON structure."
+@st.cache_data(ttl=86400, max_entries=1024, show_spinner=False)
+def _cached_missing_fields(_client, name, missing, model):
+    instructions = "\n".join(FIELD_INSTRUCTIONS[key] for key in missing)
+    keys = ", ".join(f"'{key}'" for key in missing)
     
     prompt = f"""
     I need specific information about medical researcher {name}.
-    Specifically, I'm looking for their {info_type}.
-    {specific_query}
+    Specifically, I'm looking for the following missing fields: {', '.join(missing)}.
     
-    {type_instructions}
+    {instructions}
     
-    Please provide only factual information, and format the response as JSON with the key '{info_type}'.
+    Please provide only factual information, and format the response as a single JSON object with the keys {keys}.
     """
     
+    content, _ = stream_chat_completion(
+        _client,
+        model=model,
+        messages=[
+            {"role": "system", "content": FIELD_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        prompt_cache_key=prompt_cache_key(FIELD_SYSTEM_PROMPT),
+        temperature=0.3,
+        response_format={"type": "json_object"}
+    )
+    
+    # JSON mode guarantees the reply is a bare JSON object
+    return orjson.loads(content)
+
+# Function to list the websites the user added, kept in the session until another one is added
+def get_custom_websites():
+    if st.session_state.get("custom_websites") is None:
+        st.session_state.custom_websites = [f"{site_name}: {site_url}"
+                                            for site_name, site_url in st.session_state.websites.items()
+                                            if site_name not in KNOWN_SOURCES]
+    return st.session_state.custom_websites
+
+# Function to answer a chat question by searching the user's custom websites.
+# Runs on the background executor, so it must not touch any Streamlit elements.
+def get_web_answer(client, researcher_name, question, custom_websites):
+    web_prompt = WEB_PROMPT_TEMPLATE.format(name=researcher_name, question=question, websites=' '.join(custom_websites))
+    
+    response = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": WEB_SYSTEM_PROMPT},
+            {"role": "user", "content": web_prompt}
+        ],
+        prompt_cache_key=prompt_cache_key(WEB_SYSTEM_PROMPT),
+        temperature=0.3
+    )
+    return response.choices[0].message.content
+
+# Function to answer all the suggested questions in one OpenAI call, returning {question: answer}.
+# Runs on the background executor right after a search, so it must not touch any Streamlit elements.
+def get_suggested_answers(client, researcher_name, context):
+    questions = "\n".join(f"q{i}: {question}" for i, question in enumerate(SUGGESTED_QUESTIONS, 1))
+    prompt = SUGGESTED_PROMPT_TEMPLATE.format(context=context, name=researcher_name, questions=questions)
+    
+    response = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        prompt_cache_key=prompt_cache_key(CHAT_SYSTEM_PROMPT),
+        temperature=0.3,
+        response_format={"type": "json_object"}
+    )
+    answers = orjson.loads(response.choices[0].message.content)
+    return {question: answers[f"q{i}"] for i, question in enumerate(SUGGESTED_QUESTIONS, 1) if answers.get(f"q{i}")}
+
+# Function to look up a prefetched answer to a suggested question, or None if there isn't one
+def prefetched_answer(question):
+    future = st.session_state.get("suggested_answers")
+    if future is None or future.cancelled():
+        return None
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a research assistant specializing in finding specific information about medical researchers. Provide accurate, factual information in JSON format. Ensure all URLs are direct links to relevant pages and all educational/affiliation details are complete."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        
-        # extracting and parse the JSON response
-        content = response.choices[0].message.content
+        return future.result().get(question)
+    except Exception as e:
+        print(f"Error prefetching suggested answers: {str(e)}")
+        return None
+
+# The HTTP clients are shared by every session and browser tab, so their connection pools are too
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    return create_openai_client(api_key)
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    return create_http_session()
+
+# Function to create this session's agent. Each session has its own, so an uploaded CSV,
+# batch profiles and past searches are never seen by other users.
+def create_agent(api_key):
+    return MedicalResearcherAgent(openai_api_key=api_key, client=get_openai_client(api_key),
+                                  session=get_http_session())
+
+# Function to render an empty researcher profile while a search is running.
+# Returns the skeleton (so it can be cleared or replaced by an error), a status line
+# and a placeholder inside each section's tab.
+def display_researcher_skeleton(name, specialization=None):
+    skeleton = st.empty()
+    with skeleton.container():
+        st.title(name)
+        if specialization:
+            st.write(f"**Specialization:** {specialization}")
+        status = st.empty()
+        status.markdown(" | ".join(f"{key.replace('_', ' ').title()} ⏳" for key in SECTIONS))
         
-        # extracting JSON from response (it might be surrounded by markdown code blocks)
-        json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-        if json_match:
-            content = json_match.group(1)
-        elif content.strip().startswith('{') and content.strip().endswith('}'):
-            # It's already JSON without the markdown formatting
-            pass
+        sections = {}
+        tabs = st.tabs([key.replace('_', ' ').title() for key in SECTIONS])
+        for key, tab in zip(SECTIONS, tabs):
+            with tab:
+                sections[key] = st.empty()
+                sections[key].info("Searching...")
+    return skeleton, status, sections
+
+# Function to build a numbered list, used by the list-valued sections
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_numbered_md(items):
+    if len(items) <= len(NUM_PREFIXES):
+        return "\n\n".join(prefix + str(item) for prefix, item in zip(NUM_PREFIXES, items))
+    return "\n\n".join(f"**{i}.** {item}" for i, item in enumerate(items, 1))
+
+# Function to summarise a section's items while the full profile is still loading
+def section_preview(items):
+    if not isinstance(items, list):
+        return str(items)
+    return build_numbered_md([item.get('title') or '' if isinstance(item, dict) else item for item in items])
+
+# Function to build the publications section, cached so reruns don't rebuild the markdown
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_publications_md(publications):
+    blocks = []
+    for i, pub in enumerate(islice(publications, 10), 1):
+        # CSV data lists publications as plain titles
+        if not isinstance(pub, dict):
+            pub = {'title': pub}
+    
+        lines = [f"**{i}. {pub.get('title') or 'Untitled'}**"
+                 + (f" — [View Publication]({pub['url']})" if pub.get('url') else "")]
+    
+        if pub.get('authors'):
+            lines.append(f"*Authors:* {pub['authors']}")
+    
+        # here display journal and year in same line 
+        journal_info = []
+        if pub.get('journal'):
+            journal_info.append(f"*Journal:* {pub['journal']}")
+        if pub.get('year'):
+            journal_info.append(f"*Year:* {pub['year']}")
+    
+        if journal_info:
+            lines.append(" | ".join(journal_info))
+    
+        # DOI link if available
+        if pub.get('doi'):
+            lines.append(f"*DOI:* [{pub['doi']}](https://doi.org/{pub['doi']})")
+    
+        # Direct links to different sources if available or extracted...
+        links = []
+        if pub.get('pubmed_url'):
+            links.append(f"[PubMed]({pub['pubmed_url']})")
+        if pub.get('google_scholar_url'):
+            links.append(f"[Google Scholar]({pub['google_scholar_url']})")
+        if pub.get('journal_url'):
+            links.append(f"[Journal]({pub['journal_url']})")
+    
+        if links:
+            lines.append("*Links:* " + " | ".join(links))
+    
+        blocks.append("\n\n".join(lines))
+    return "### Notable Publications\n\n" + "".join(block + "\n\n---\n\n" for block in blocks)
+
+# Function to build the clinical trials section
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_trials_md(trials):
+    blocks = []
+    for i, trial in enumerate(trials, 1):
+        if not isinstance(trial, dict):
+            trial = {'title': trial}
+    
+        lines = [f"**{i}. {trial.get('title') or 'Untitled trial'}**"
+                 + (f" — [View Trial]({trial['url']})" if trial.get('url') else "")]
+    
+        # here display status and condition
+        status_condition = []
+        if trial.get('status'):
+            status_condition.append(f"*Status:* {trial['status']}")
+        if trial.get('condition'):
+            status_condition.append(f"*Condition:* {trial['condition']}")
+    
+        if status_condition:
+            lines.append(" | ".join(status_condition))
+    
+        # display identifier if available
+        if trial.get('identifier'):
+            lines.append(f"*Identifier:* {trial['identifier']}")
+    
+        # here display link to direct ClinicalTrials.gov page if available
+        if trial.get('url') and 'clinicaltrials.gov' in trial.get('url', ''):
+            lines.append(f"[View on ClinicalTrials.gov]({trial['url']})")
+    
+        blocks.append("\n\n".join(lines))
+    return "### Clinical Trials\n\n" + "".join(block + "\n\n---\n\n" for block in blocks)
+
+# Function to build the affiliations section, linking institutions found among the sources
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_affiliations_md(affiliations, source_urls):
+    lines = ["### Institutional Affiliations"]
+    # lowercasing the source names once rather than for every affiliation
+    sources_lc = {source.lower(): url for source, url in (source_urls or {}).items() if url}
+    for i, affiliation in enumerate(affiliations, 1):
+        lines.append(f"**{i}.** {affiliation}")
+
+        # Look for links to institution websites in source_urls
+        institution_name = str(affiliation).lower().split(',', 1)[0]
+        url = next((url for source, url in sources_lc.items() if institution_name in source), None)
+        if url:
+            lines.append(f"[Visit institution website]({url})")
+    return "\n\n".join(lines)
+
+# Function to build the markdown for the list-valued profile sections. Run once per search
+# so reruns only look the strings up instead of re-hashing the data for the cached builders.
+def build_profile_md(researcher_data):
+    profile_md = {}
+
+    publications = researcher_data.get('publications')
+    if publications:
+        profile_md["Publications"] = build_publications_md(publications)
+
+    trials = researcher_data.get('clinical_trials')
+    if trials:
+        profile_md["Clinical Trials"] = build_trials_md(trials)
+
+    education = researcher_data.get('education')
+    if isinstance(education, list) and education:
+        profile_md["Education"] = "### Educational Background\n\n" + build_numbered_md(education)
+
+    affiliations = researcher_data.get('affiliations')
+    if affiliations:
+        profile_md["Affiliations"] = build_affiliations_md(affiliations, researcher_data.get('source_urls'))
+
+    interests = researcher_data.get('research_interests')
+    if interests:
+        profile_md["Research Interests"] = "### Research Focus Areas\n\n" + build_numbered_md(interests)
+
+    return profile_md
+
+# Function to describe a publication or clinical trial for the chat context, with its link if known
+def context_item(item):
+    if not isinstance(item, dict):
+        return str(item)
+    url = item.get('url')
+    return f"{item.get('title') or ''}{f' (URL: {url})' if url else ''}"
+
+# Function to describe a researcher for the chat prompt. Built once per search rather than per question.
+def build_researcher_context(researcher_name, researcher_data):
+    context_parts = []
+    
+    summary = researcher_data.get('summary')
+    if summary:
+        context_parts.append(f"Summary: {summary}")
+
+    education = researcher_data.get('education')
+    if education:
+        if isinstance(education, list):
+            context_parts.append(f"Education: {', '.join(education)}")
         else:
-            # tryinf to extract anything that looks like JSON
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                content = json_match.group(0)
-        
+            context_parts.append(f"Education: {education}")
+
+    affiliations = researcher_data.get('affiliations')
+    if affiliations:
+        context_parts.append(f"Affiliations: {', '.join(affiliations)}")
+
+    interests = researcher_data.get('research_interests')
+    if interests:
+        context_parts.append(f"Research interests: {', '.join(interests)}")
+
+    contributions = researcher_data.get('key_contributions')
+    if isinstance(contributions, str) and contributions:
+        context_parts.append(f"Key contributions: {contributions}")
+    elif isinstance(contributions, list) and contributions:
+        context_parts.append(f"Key contributions: {', '.join(contributions)}")
+
+    publications = researcher_data.get('publications')
+    if publications:
+        pub_texts = [context_item(pub) for pub in islice(publications, 5)]  # only 5 display...
+        context_parts.append(f"Notable publications: {'; '.join(pub_texts)}")
+
+    trials = researcher_data.get('clinical_trials')
+    if trials:
+        trial_texts = [context_item(trial) for trial in islice(trials, 3)]  # 3 display
+        context_parts.append(f"Clinical trials: {'; '.join(trial_texts)}")
+
+    url_parts = [f"{source.title()}: {url}"
+                 for source, url in (researcher_data.get('source_urls') or {}).items() if url]
+    if url_parts:
+        context_parts.append(f"Reference URLs: {'; '.join(url_parts)}")
+
+    if not context_parts:
+        return ""
+    return "Information about " + researcher_name + ":\n\n" + "\n\n".join(context_parts)
+
+# Function to report on a submitted CSV Batch API job. A fragment rerun every BATCH_POLL_INTERVAL
+# seconds, so a finished job shows up without the user clicking anything. It is only drawn while a
+# job is pending, and a finished job reruns the whole app, so sessions without one never poll.
+@st.fragment(run_every=BATCH_POLL_INTERVAL)
+def csv_batch_status(batch_id):
+    # checking on the job at each timed rerun; reruns of the whole app in between check at most
+    # twice per poll interval
+    check_now = st.button("Check batch results", key="check_csv_batch")
+    if check_now or time.time() - st.session_state.get("csv_batch_checked", 0) >= BATCH_POLL_INTERVAL / 2:
+        st.session_state.csv_batch_checked = time.time()
         try:
-            result_data = json.loads(content)
-            
-            # validating URLs for publication and clinical trial data
-            if info_type == "publications" and "publications" in result_data:
-                for pub in result_data["publications"]:
-                    if not pub.get("url") or not pub["url"].startswith(("http://", "https://")):
-                        # creating a search URL if missing....for just visuals
-                        if pub.get("title"):
-                            title_query = pub["title"].replace(" ", "+")
-                            pub["url"] = f"https://pubmed.ncbi.nlm.nih.gov/?term={title_query}"
-            
-            if info_type == "clinical_trials" and "clinical_trials" in result_data:
-                for trial in result_data["clinical_trials"]:
-                    if not trial.get("url") or not trial["url"].startswith(("http://", "https://")):
-                        
-                        if trial.get("title"):
-                            title_query = trial["title"].replace(" ", "+")
-                            trial["url"] = f"https://clinicaltrials.gov/search?term={title_query}"
-            
-            return result_data
-        except json.JSONDecodeError:
-            # here if we can't parse the JSON, create a simple structure
-            result = {info_type: [content.strip()]}
-            return result
-            
-    except Exception as e:
-        print(f"Error getting specific researcher info: {str(e)}")
-        return {}
+            status, stored = st.session_state.agent.collect_csv_batch(batch_id)
+            st.session_state.csv_batch_status = status
+        except Exception as e:
+            st.error(f"Error checking batch: {str(e)}")
+        else:
+            if status in BATCH_DONE_STATUSES:
+                st.session_state.csv_batch_result = (batch_id, status, stored)
+                st.session_state.csv_batch_id = None
+                st.rerun()
+    st.info(f"Batch {batch_id} is {st.session_state.get('csv_batch_status', 'submitted').replace('_', ' ')}.")
 
 # Initialize session state variables
 if 'agent' not in st.session_state:
@@ -345,13 +845,13 @@ if 'agent' not in st.session_state:
         api_key = api_key.replace(" ", "").replace("\n", "").strip()
     
     if api_key:
-        st.session_state.agent = MedicalResearcherAgent(openai_api_key=api_key)
+        st.session_state.agent = create_agent(api_key)
     else:
         # manual API key entry as fallback 
         st.error("OpenAI API key not found in environment variables. Enter it manually below.")
         api_key = st.text_input("Enter your OpenAI API key:", type="password")
         if api_key:
-            st.session_state.agent = MedicalResearcherAgent(openai_api_key=api_key)
+            st.session_state.agent = create_agent(api_key)
         else:
             st.stop()
 
@@ -360,18 +860,25 @@ if 'current_researcher' not in st.session_state:
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'websites' not in st.session_state:
-    st.session_state.websites = {
-        "pubmed": "https://pubmed.ncbi.nlm.nih.gov",
-        "researchgate": "https://www.researchgate.net",
-        "google_scholar": "https://scholar.google.com",
-        "clinical_trials": "https://clinicaltrials.gov"
-    }
+    # a copy of the agent's sources, so adding a website never changes the defaults;
+    # searches pass this session's websites to the agent explicitly
+    st.session_state.websites = dict(st.session_state.agent.sources)
 if 'csv_uploaded' not in st.session_state:
     st.session_state.csv_uploaded = False
 if 'search_performed' not in st.session_state:
     st.session_state.search_performed = False
 if 'researcher_data' not in st.session_state:
     st.session_state.researcher_data = {}
+if 'researcher_contexts' not in st.session_state:
+    st.session_state.researcher_contexts = {}
+if 'profile_md' not in st.session_state:
+    st.session_state.profile_md = {}
+if 'answer_cache' not in st.session_state:
+    st.session_state.answer_cache = {}
+if 'chat_owner' not in st.session_state:
+    # a random id kept in the page URL, so a refresh finds this browser's saved conversations again
+    st.session_state.chat_owner = st.query_params.get("sid") or secrets.token_urlsafe(16)
+    st.query_params["sid"] = st.session_state.chat_owner
 
 # creating the main layout
 st.title("Medical Researcher Search Tool")
@@ -389,24 +896,50 @@ with input_tabs[0]:
     
     if csv_file is not None and not st.session_state.csv_uploaded:
         try:
-            # saving uploaded file to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-                tmp_file.write(csv_file.getvalue())
-                tmp_path = tmp_file.name
-            
-            # loading the CSV data
-            df = st.session_state.agent.load_csv_data(tmp_path)
+            # parsing the upload straight from memory, no temporary file needed
+            df = st.session_state.agent.load_csv_data(csv_file)
             
             # Update session state
             st.session_state.csv_uploaded = True
             st.success(f"CSV file uploaded successfully! {len(df)} researchers loaded.")
             
-            # cleaning up temp file
-            os.unlink(tmp_path)
+            # Looking up PubMed IDs in the background so publication links can point at the article
+            if 'Name' in df.columns:
+                get_background_executor().submit(prefetch_pmids, df['Name'].dropna().tolist())
         except Exception as e:
             st.error(f"Error processing CSV file: {str(e)}")
-            if 'tmp_path' in locals():
-                os.unlink(tmp_path)  # Clean up the temporary file in case of error
+    
+    # Building AI profiles for the whole CSV, either now with several researchers per OpenAI call,
+    # or as one Batch API job at half the cost of live lookups
+    if st.session_state.csv_uploaded and st.session_state.agent.client:
+        if st.button("Look up all CSV researchers with OpenAI now", key="lookup_csv_now"):
+            with st.spinner("Looking up researchers..."):
+                try:
+                    stored = st.session_state.agent.lookup_csv_researchers()
+                    st.success(f"Stored AI profiles for {stored} researchers.")
+                except Exception as e:
+                    st.error(f"Error looking up researchers: {str(e)}")
+        
+        # the outcome of a batch job that finished during the last status check
+        result = st.session_state.pop("csv_batch_result", None)
+        if result:
+            batch_id, status, stored = result
+            if status == "completed":
+                st.success(f"Batch completed: stored AI profiles for {stored} researchers.")
+            else:
+                st.error(f"Batch {batch_id} {status}.")
+        
+        if st.session_state.get("csv_batch_id") is None:
+            if st.button("Look up all CSV researchers with OpenAI (batch)", key="submit_csv_batch",
+                         help="Results arrive within 24 hours at half the cost of searching one by one"):
+                try:
+                    st.session_state.csv_batch_id = st.session_state.agent.submit_csv_batch()
+                    st.session_state.csv_batch_checked = time.time()
+                    st.success(f"Batch submitted: {st.session_state.csv_batch_id}")
+                except Exception as e:
+                    st.error(f"Error submitting batch: {str(e)}")
+        if st.session_state.get("csv_batch_id"):
+            csv_batch_status(st.session_state.csv_batch_id)
 
 # Tab 2: Custom Websites
 with input_tabs[1]:
@@ -429,10 +962,10 @@ with input_tabs[1]:
         st.write("")
         if st.button("Add Website", key="add_website_btn"):
             if new_site_name and new_site_url:
-                if not new_site_url.startswith(("http://", "https://")):
+                if not URL_OK.match(new_site_url):
                     new_site_url = "https://" + new_site_url
                 st.session_state.websites[new_site_name] = new_site_url
-                st.session_state.agent.sources[new_site_name] = new_site_url
+                st.session_state.custom_websites = None
                 st.success(f"Added {new_site_name}: {new_site_url}")
                 st.rerun()
             else:
@@ -450,54 +983,77 @@ with input_tabs[2]:
     
     search_col1, search_col2 = st.columns([1, 3])
     with search_col1:
-        if st.button("Search Researcher", key="search_button"):
-            if not researcher_name:
-                st.error("Please enter a researcher name")
-            else:
-                # creating loading spinner during search..for visuals only....
-                with st.spinner(f"Searching for information about {researcher_name}..."):
-                    try:
-                        # Update agent with current websites
-                        st.session_state.agent.sources = st.session_state.websites
+        search_clicked = st.button("Search Researcher", key="search_button")
+    with search_col2:
+        st.markdown("**💡 Tip:** The search will query PubMed, ResearchGate, Google Scholar, ClinicalTrials.gov and use web search.") ##..just added to show....remove it ..
+    
+    if search_clicked:
+        if not researcher_name:
+            st.error("Please enter a researcher name")
+        else:
+            # showing an empty profile straight away and filling it in as the search progresses
+            skeleton, status, sections = display_researcher_skeleton(researcher_name, specialization)
+            found = set()
+            
+            # creating loading spinner during search..for visuals only....
+            with st.spinner(f"Searching for information about {researcher_name}..."):
+                try:
+                    # here search for researcher information with fallback
+                    researcher_data, error = None, None
+                    for field, value in search_researcher_stream(
+                        st.session_state.agent, 
+                        researcher_name, 
+                        specialization,
+                        st.session_state.websites
+                    ):
+                        if field == "result":
+                            researcher_data, error = value
+                        else:
+                            found.add(field)
+                            sections[field].markdown(section_preview(value))
+                            status.markdown(" | ".join(
+                                f"{key.replace('_', ' ').title()} {'✓' if key in found else '⏳'}" for key in SECTIONS
+                            ))
+                    
+                    if error:
+                        skeleton.error(error)
+                    elif researcher_data:
+                        skeleton.empty()
                         
-                        # here search for researcher information with fallback
-                        researcher_data, error = search_researcher_with_fallback(
-                            st.session_state.agent, 
-                            researcher_name, 
-                            specialization
+                        # Update session state
+                        st.session_state.current_researcher = researcher_name
+                        st.session_state.search_performed = True
+                        st.session_state.researcher_data = researcher_data
+                        st.session_state.profile_md = build_profile_md(researcher_data)
+                        st.session_state.researcher_contexts[researcher_name] = build_researcher_context(researcher_name, researcher_data)
+                        
+                        # answering the suggested questions in the background while the profile is read
+                        st.session_state.suggested_answers = get_background_executor().submit(
+                            get_suggested_answers, st.session_state.agent.client,
+                            researcher_name, st.session_state.researcher_contexts[researcher_name]
                         )
                         
-                        if error:
-                            st.error(error)
-                        elif researcher_data:
-                            # Update session state
-                            st.session_state.current_researcher = researcher_name
-                            st.session_state.search_performed = True
-                            st.session_state.researcher_data = researcher_data
-                            
-                            # clearing chat history for new researcher
-                            st.session_state.chat_history = []
-                            st.session_state.chat_history.append({
-                                "role": "assistant",
-                                "content": f"I've gathered information about {researcher_name}. What would you like to know?"
-                            })
-                            
-                            #  message
-                            if researcher_data.get('ai_generated'):
-                                st.success(f"Found information about {researcher_name} (AI-generated with web search)")
-                            else:
-                                st.success(f"Found information about {researcher_name}")
-                            
-                            # Store in researchers_data dictionary for the agent
-                            st.session_state.agent.researchers_data[researcher_name] = researcher_data
+                        # picking up an earlier conversation about this researcher, or starting a new one
+                        st.session_state.chat_history = load_chat_history(researcher_name) or [
+                            chat_entry("assistant", f"I've gathered information about {researcher_name}. What would you like to know?")
+                        ]
+                        
+                        #  message
+                        if researcher_data.get('ai_generated'):
+                            st.success(f"Found information about {researcher_name} (AI-generated with web search)")
                         else:
-                            st.error(f"No information found for {researcher_name}. Please try another name or check spelling.")
-                    except Exception as e:
-                        st.error(f"Error searching for researcher: {str(e)}")
-    with search_col2:
-        st.markdown("**💡 Tip:** The search will query PubMed, ResearchGate, Google Scholar, ClinicalTrials.gov and use web search.") ##..just added to show....remove it ..
+                            st.success(f"Found information about {researcher_name}")
+                        
+                        # Store in researchers_data dictionary for the agent
+                        st.session_state.agent.researchers_data[researcher_name] = researcher_data
+                    else:
+                        skeleton.error(f"No information found for {researcher_name}. Please try another name or check spelling.")
+                except Exception as e:
+                    skeleton.error(f"Error searching for researcher: {str(e)}")
 
-# function to display researcher profile
+# function to display researcher profile. A fragment, so picking another section
+# reruns only the profile rather than the whole app.
+@st.fragment
 def display_researcher_profile(researcher_data):
     """Display the researcher profile in a well-formatted way."""
     if not researcher_data:
@@ -515,442 +1071,281 @@ def display_researcher_profile(researcher_data):
         st.warning("Some information was generated using AI as it wasn't found in primary sources. Please verify critical details.")
     
    
-    if researcher_data.get('basic_info'):
+    basic_info = researcher_data.get('basic_info')
+    if basic_info:
         st.subheader("Basic Information")
-        for key, value in researcher_data['basic_info'].items():
-            if key != 'full_name':  # Skip full name as we already displayed it
-                st.write(f"**{key.replace('_', ' ').title()}:** {value}")
+        # Skip full name as we already displayed it
+        st.markdown("\n\n".join(f"**{key.replace('_', ' ').title()}:** {value}"
+                                for key, value in basic_info.items() if key != 'full_name' and value))
     
     
-    if researcher_data.get('summary'):
+    summary = researcher_data.get('summary')
+    if summary:
         st.subheader("Summary")
-        st.write(researcher_data.get('summary'))
+        st.write(summary)
+    
+    # Sections are picked with a radio rather than st.tabs, which builds every tab's
+    # body on every rerun; this way only the visible section is rendered
+    section = st.radio("Section", PROFILE_SECTIONS, horizontal=True,
+                       label_visibility="collapsed", key="profile_section")
     
-    # tabs for different sections
-    tabs = st.tabs(["Publications", "Clinical Trials", "Education", "Affiliations", "Research Interests", "Other Info"])
+    # Each section is built up as one markdown string and rendered with a single call,
+    # since every st.markdown is a separate element sent to the browser. The strings are
+    # built once per search; fall back to building them for data loaded another way.
+    profile_md = st.session_state.profile_md or build_profile_md(researcher_data)
     
     # Publications tab
-    with tabs[0]:
-        if researcher_data.get('publications'):
-            st.markdown("### Notable Publications")
-            for i, pub in enumerate(researcher_data['publications'][:10], 1):
-                publication_title = pub.get('title', 'Untitled')
-                
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    st.markdown(f"**{i}. {publication_title}**")
-                with col2:
-                    if pub.get('url'):
-                        st.markdown(f"[View Publication]({pub['url']})")
-                
-                if pub.get('authors'):
-                    st.markdown(f"*Authors:* {pub['authors']}")
-                    
-                # here display journal and year in same line 
-                if pub.get('journal'):
-                    journal_info.append(f"*Journal:* {pub['journal']}")
-                if pub.get('year'):
-                    journal_info.append(f"*Year:* {pub['year']}")
-                
-                if journal_info:
-                    st.markdown(" | ".join(journal_info))
-                
-                # DOI link if available
-                if pub.get('doi'):
-                    st.markdown(f"*DOI:* [{pub['doi']}](https://doi.org/{pub['doi']})")
-                    
-                # Direct links to different sources if available or extracted...
-                links = []
-                if pub.get('pubmed_url'):
-                    links.append(f"[PubMed]({pub['pubmed_url']})")
-                if pub.get('google_scholar_url'):
-                    links.append(f"[Google Scholar]({pub['google_scholar_url']})")
-                if pub.get('journal_url'):
-                    links.append(f"[Journal]({pub['journal_url']})")
-                
-                if links:
-                    st.markdown("*Links:* " + " | ".join(links))
-                
-                st.markdown("---")
+    if section == "Publications":
+        if "Publications" in profile_md:
+            st.markdown(profile_md["Publications"])
         else:
             st.info("No publications found. Try adding specific university or research institution websites to improve search results.")
     
     # Clinical Trials tab
-    with tabs[1]:
-        if researcher_data.get('clinical_trials'):
-            st.markdown("### Clinical Trials")
-            for i, trial in enumerate(researcher_data['clinical_trials'], 1):
-                trial_title = trial.get('title', 'Untitled trial')
-                
-              
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    st.markdown(f"**{i}. {trial_title}**")
-                with col2:
-                    if trial.get('url'):
-                        st.markdown(f"[View Trial]({trial['url']})")
-                
-                # here display status and condition
-                status_condition = []
-                if trial.get('status'):
-                    status_condition.append(f"*Status:* {trial['status']}")
-                if trial.get('condition'):
-                    status_condition.append(f"*Condition:* {trial['condition']}")
-                
-                if status_condition:
-                    st.markdown(" | ".join(status_condition))
-                
-                # display identifier if available
-                if trial.get('identifier'):
-                    st.markdown(f"*Identifier:* {trial['identifier']}")
-                
-                # here display link to direct ClinicalTrials.gov page if available
-                if trial.get('url') and 'clinicaltrials.gov' in trial.get('url', ''):
-                    st.markdown(f"[View on ClinicalTrials.gov]({trial['url']})")
-                    
-                st.markdown("---")
+    elif section == "Clinical Trials":
+        if "Clinical Trials" in profile_md:
+            st.markdown(profile_md["Clinical Trials"])
         else:
             st.info("No clinical trials found. The researcher may not be involved in clinical trials, or this information is not publicly available.")
             st.markdown("**Tip:** Try adding the researcher's institution website or clinicaltrials.gov profile URL in the 'Add Custom Websites' section.")
     
     # Education tab 
-    with tabs[2]:
-        if researcher_data.get('education'):
+    elif section == "Education":
+        education = researcher_data.get('education')
+        if "Education" in profile_md:
+            st.markdown(profile_md["Education"])
+        elif education:
             st.markdown("### Educational Background")
-            if isinstance(researcher_data['education'], list):
-                for i, edu in enumerate(researcher_data['education'], 1):
-                    st.markdown(f"**{i}.** {edu}")
-            else:
-                st.write(researcher_data['education'])
+            st.write(education)
         else:
             st.info("No educational information found. Try using the chat feature to ask about their educational background.")
     
     # Affiliations tab
-    with tabs[3]:
-        if researcher_data.get('affiliations'):
-            st.markdown("### Institutional Affiliations")
-            for i, affiliation in enumerate(researcher_data['affiliations'], 1):
-                st.markdown(f"**{i}.** {affiliation}")
-                
-                # Look for links to institution websites in source_urls
-                if researcher_data.get('source_urls'):
-                    for source, url in researcher_data['source_urls'].items():
-                        institution_name = affiliation.lower().split(',')[0]
-                        if institution_name in source.lower() and url:
-                            st.markdown(f"[Visit institution website]({url})")
-                            break
+    elif section == "Affiliations":
+        if "Affiliations" in profile_md:
+            st.markdown(profile_md["Affiliations"])
         else:
             st.info("No affiliations found. Try adding the researcher's institution website to improve search results.")
     
     # Research Interests tab
-    with tabs[4]:
-        if researcher_data.get('research_interests'):
-            st.markdown("### Research Focus Areas")
-            for i, interest in enumerate(researcher_data['research_interests'], 1):
-                st.markdown(f"**{i}.** {interest}")
+    elif section == "Research Interests":
+        if "Research Interests" in profile_md:
+            st.markdown(profile_md["Research Interests"])
         else:
             st.info("No research interests found. Try using the chat feature to ask about their research focus areas.")
     
     # Other Info tab
-    with tabs[5]:
+    else:
         # Key contributions section
-        if researcher_data.get('key_contributions'):
+        contributions = researcher_data.get('key_contributions')
+        if contributions:
             st.subheader("Key Contributions")
             
             # Check if it's already a string or if it might be in another format
-            if isinstance(researcher_data['key_contributions'], str):
-                st.write(researcher_data['key_contributions'])
-            elif isinstance(researcher_data['key_contributions'], list):
-                for i, contribution in enumerate(researcher_data['key_contributions'], 1):
-                    st.markdown(f"**{i}.** {contribution}")
-            elif isinstance(researcher_data['key_contributions'], dict):
+            if isinstance(contributions, str):
+                st.write(contributions)
+            elif isinstance(contributions, list):
+                st.markdown(build_numbered_md(contributions))
+            elif isinstance(contributions, dict):
                 # If it's a dictionary, formatting each entry....
-                for key, value in researcher_data['key_contributions'].items():
-                    st.markdown(f"**{key}:** {value}")
+                st.markdown("\n\n".join(f"**{key}:** {value}"
+                                        for key, value in contributions.items()))
             else:
                 # here just convert to string and display
-                st.write(str(researcher_data['key_contributions']))
+                st.write(str(contributions))
         
         # Additional insights section
-        if researcher_data.get('additional_insights'):
+        insights = researcher_data.get('additional_insights')
+        if insights:
             st.subheader("Additional Insights")
-            st.write(researcher_data['additional_insights'])
+            st.write(insights)
         
         # Data sources section
-        if researcher_data.get('source_urls'):
+        source_urls = researcher_data.get('source_urls')
+        if source_urls:
             st.subheader("Data Sources")
-            for source, url in researcher_data['source_urls'].items():
-                if url:
-                    st.markdown(f"- [{source.title()}]({url})")
+            st.markdown("\n".join(f"- [{source.title()}]({url})" for source, url in source_urls.items() if url))
                     
         # Citations section
-        if researcher_data.get('citations'):
+        citations = researcher_data.get('citations')
+        if citations:
             st.subheader("Citations")
-            if isinstance(researcher_data['citations'], dict):
-                for metric, count in researcher_data['citations'].items():
-                    st.markdown(f"**{metric.title()}:** {count}")
-            elif isinstance(researcher_data['citations'], (str, int)):
-                st.markdown(f"**Citations:** {researcher_data['citations']}")
+            if isinstance(citations, dict):
+                st.markdown("\n\n".join(f"**{metric.title()}:** {count}"
+                                        for metric, count in citations.items()))
+            elif isinstance(citations, (str, int)):
+                st.markdown(f"**Citations:** {citations}")
             
         # Collaborators section
-        if researcher_data.get('collaborators'):
+        collaborators = researcher_data.get('collaborators')
+        if collaborators:
             st.subheader("Collaborators")
-            if isinstance(researcher_data['collaborators'], list):
-                for i, collaborator in enumerate(researcher_data['collaborators'], 1):
-                    st.markdown(f"**{i}.** {collaborator}")
+            if isinstance(collaborators, list):
+                st.markdown(build_numbered_md(collaborators))
             else:
-                st.write(researcher_data['collaborators'])
+                st.write(collaborators)
 
-# Results and chat interface (only show if search has been performed)
-if st.session_state.search_performed and st.session_state.current_researcher:
-    
-   # 2 tabs
-    tab1, tab2 = st.tabs(["Researcher Profile", "Ask Questions"])
+# Function to rerun just the chat panel. When the panel was drawn by a full run of the
+# app (e.g. a pending question picked up after another widget changed) only a full rerun is allowed.
+def rerun_chat():
+    try:
+        st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException:
+        st.rerun()
+
+# Function to render the chat tab. Run as a fragment so asking a question only reruns the chat,
+# not the profile and the rest of the page.
+@st.fragment
+def chat_panel():
+    st.subheader("Ask Questions About This Researcher")
     
-    # Profile tab
-    with tab1:
-        try:
-            researcher = st.session_state.researcher_data
-            display_researcher_profile(researcher)
-        except Exception as e:
-            st.error(f"Error displaying researcher profile: {str(e)}")
+    # let's display chat history
+    # plain messages skip markdown parsing, which is much slower to render
+    for message in st.session_state.chat_history:
+        if message.get("markdown", True):
+            st.chat_message(message["role"]).markdown(message["content"])
+        else:
+            st.chat_message(message["role"]).text(message["content"])
     
-    # Chat tab
-    with tab2:
-        st.subheader("Ask Questions About This Researcher")
-        
-        # let's display chat history
-        for message in st.session_state.chat_history:
-            if message["role"] == "user":
-                st.chat_message("user").write(message["content"])
+    # adding custom website search input for specific questions
+    with st.expander("Add a specific website to search for more information"):
+        custom_website = st.text_input("Enter website URL (e.g., university profile page)", key="custom_website_chat")
+        if st.button("Add Website to Search Sources", key="add_website_chat"):
+            if custom_website:
+                site_name = f"custom_{len(st.session_state.websites)}"
+                st.session_state.websites[site_name] = custom_website
+                st.session_state.custom_websites = None
+                st.success(f"Added {custom_website} to search sources")
+                st.rerun()
             else:
-                st.chat_message("assistant").write(message["content"])
-        
-        # adding custom website search input for specific questions
-        with st.expander("Add a specific website to search for more information"):
-            custom_website = st.text_input("Enter website URL (e.g., university profile page)", key="custom_website_chat")
-            if st.button("Add Website to Search Sources", key="add_website_chat"):
-                if custom_website:
-                    site_name = f"custom_{len(st.session_state.websites)}"
-                    st.session_state.websites[site_name] = custom_website
-                    st.session_state.agent.sources[site_name] = custom_website
-                    st.success(f"Added {custom_website} to search sources")
-                    st.rerun()
-                else:
-                    st.error("Please enter a valid URL")
+                st.error("Please enter a valid URL")
+    
+    question = st.chat_input("Ask a question about this researcher...") or st.session_state.pop("pending_question", None)
+    
+    if question:
+        st.session_state.chat_history.append(chat_entry("user", question))
         
-        question = st.chat_input("Ask a question about this researcher...")
+        # here displaying the user message
+        st.chat_message("user").write(question)
         
-        if question:
-            st.session_state.chat_history.append({"role": "user", "content": question})
-            
-            # here displaying the user message
-            st.chat_message("user").write(question)
-            
-            with st.spinner("Searching for information..."):
-                try:
-                    researcher_name = st.session_state.current_researcher
-                    
-                    context = ""
-                    if researcher_name in st.session_state.agent.researchers_data:
-                        researcher_data = st.session_state.agent.researchers_data[researcher_name]
-                        context_parts = []
-                        
-        
-                        if researcher_data.get('summary'):
-                            context_parts.append(f"Summary: {researcher_data.get('summary')}")
-                        
-                       
-                        if researcher_data.get('education'):
-                            if isinstance(researcher_data['education'], list):
-                                context_parts.append(f"Education: {', '.join(researcher_data.get('education'))}")
-                            else:
-                                context_parts.append(f"Education: {researcher_data.get('education')}")
-                        
-                        if researcher_data.get('affiliations'):
-                            context_parts.append(f"Affiliations: {', '.join(researcher_data.get('affiliations'))}")
-                            
-                        if researcher_data.get('research_interests'):
-                            context_parts.append(f"Research interests: {', '.join(researcher_data.get('research_interests'))}")
-                        
-    
-                        if researcher_data.get('key_contributions'):
-                            if isinstance(researcher_data['key_contributions'], str):
-                                context_parts.append(f"Key contributions: {researcher_data.get('key_contributions')}")
-                            elif isinstance(researcher_data['key_contributions'], list):
-                                context_parts.append(f"Key contributions: {', '.join(researcher_data.get('key_contributions'))}")
-                        
-           
-                        if researcher_data.get('publications'):
-                            pubs = researcher_data.get('publications')[:5]  # only 5 display...
-                            pub_texts = []
-                            for pub in pubs:
-                                pub_text = pub.get('title', '')
-                                if pub.get('url'):
-                                    pub_text += f" (URL: {pub.get('url')})"
-                                pub_texts.append(pub_text)
-                            if pub_texts:
-                                context_parts.append(f"Notable publications: {'; '.join(pub_texts)}")
-                        
-                        
-                        if researcher_data.get('clinical_trials'):
-                            trials = researcher_data.get('clinical_trials')[:3]  # 3 display
-                            trial_texts = []
-                            for trial in trials:
-                                trial_text = trial.get('title', '')
-                                if trial.get('url'):
-                                    trial_text += f" (URL: {trial.get('url')})"
-                                trial_texts.append(trial_text)
-                            if trial_texts:
-                                context_parts.append(f"Clinical trials: {'; '.join(trial_texts)}")
-                        
-                        if researcher_data.get('source_urls'):
-                            url_parts = []
-                            for source, url in researcher_data['source_urls'].items():
-                                if url:
-                                    url_parts.append(f"{source.title()}: {url}")
-                            if url_parts:
-                                context_parts.append(f"Reference URLs: {'; '.join(url_parts)}")
-                        
-                        if context_parts:
-                            context = "Information about " + researcher_name + ":\n\n" + "\n\n".join(context_parts)
-                    
-                    custom_websites = []
-                    for site_name, site_url in st.session_state.websites.items():
-                        if site_name not in ['pubmed', 'researchgate', 'google_scholar', 'clinical_trials']:
-                            custom_websites.append(f"{site_name}: {site_url}")
-                    
-                    if custom_websites:
-                        context += "\n\nCustom websites provided for reference:\n" + "\n".join(custom_websites)
-                    
+        with st.spinner("Searching for information..."):
+            try:
+                researcher_name = st.session_state.current_researcher
+                
+                # built once per researcher when the search completes
+                context = st.session_state.researcher_contexts.get(researcher_name, "")
+                
+                custom_websites = get_custom_websites()
+                
+                if custom_websites:
+                    context += "\n\nCustom websites provided for reference:\n" + "\n".join(custom_websites)
+                
 
-                    openai.api_key = st.session_state.agent.openai_api_key
+                try:
+                    # a question asked again about the same context is answered from this session's cache
+                    answer_key = answer_cache_key(researcher_name, question, context)
+                    answer = st.session_state.answer_cache.get(answer_key)
+                    if answer is not None:
+                        st.chat_message("assistant").markdown(answer)
+                    else:
+                        # The website search is only needed if the context falls short, but starting it
+                        # now overlaps its round-trip with the primary answer instead of adding to it
+                        web_future = None
+                        if any(site_name.startswith("custom_") for site_name in st.session_state.websites):
+                            web_future = get_background_executor().submit(
+                                get_web_answer, st.session_state.agent.client,
+                                researcher_name, question, custom_websites
+                            )
                     
-                    try:
                         # First attempt to use existing data to answer
-                        prompt = f"""
-                        {context}
-                        
-                        Question about {researcher_name}: {question}
-                        
-                        Please provide a detailed, factual answer based on the information provided in the context.
-                        If the context doesn't contain sufficient information to fully answer the question,
-                        explicitly state this and then provide your best estimate of the answer based on
-                        general knowledge.
-                        
-                        When referencing publications, clinical trials, educational background, or affiliations,
-                        include direct links when available.
-                        """
-                        
-                        response = openai.ChatCompletion.create(
-                            model="gpt-4o",
+                        prompt = CHAT_PROMPT_TEMPLATE.format(context=context, name=researcher_name, question=question)
+                    
+                        # streaming the answer so it appears as it is written
+                        assistant_message = st.chat_message("assistant")
+                        answer = assistant_message.write_stream(stream_text(
+                            st.session_state.agent.client,
+                            model=CHAT_MODEL,
                             messages=[
-                                {"role": "system", "content": "You are a helpful research assistant specializing in medical researchers. Provide accurate, comprehensive answers about medical researchers based on available information. Include links when available, especially for publications and clinical trials."},
+                                {"role": "system", "content": CHAT_SYSTEM_PROMPT},
                                 {"role": "user", "content": prompt}
                             ],
+                            prompt_cache_key=prompt_cache_key(CHAT_SYSTEM_PROMPT),
                             temperature=0.3
-                        )
-                        
-                        # get the answer from the response
-                        answer = response.choices[0].message.content
-                        
+                        ))
+                    
                         # checking if the answer indicates missing information
-                        missing_info_phrases = [
-                            "context doesn't contain", 
-                            "information isn't in the provided context",
-                            "no information in the context",
-                            "I don't have specific information",
-                            "context doesn't provide",
-                            "don't have that information"
-                        ]
-                        
-                        needs_web_search = any(phrase in answer.lower() for phrase in missing_info_phrases)
+                        needs_web_search = bool(MISSING_INFO_RE.search(answer))
+                    
+                        if web_future is not None and needs_web_search:
+                            assistant_message.markdown("After searching provided websites, I found additional information:")
+                            with st.spinner("Searching provided websites..."):
+                                web_answer = web_future.result()
+                            assistant_message.markdown(web_answer)
                         
-            
-                        if needs_web_search and "custom_" in "".join(st.session_state.websites.keys()):
-                            # here we perform a targeted search using custom websites
-                            web_prompt = f"""
-                            I need specific information about {researcher_name} to answer this question: {question}
-                            
-                            I should search these websites for information:
-                            {' '.join(custom_websites)}
-                            
-                            Please search for factual information to answer the question, and provide only
-                            verified information with source links when possible.
-                            """
-                            
-                            web_response = openai.ChatCompletion.create(
-                                model="gpt-4o",
-                                messages=[
-                                    {"role": "system", "content": "You are a research assistant with web search capabilities. Find specific information about medical researchers by searching the provided websites."},
-                                    {"role": "user", "content": web_prompt}
-                                ],
-                                temperature=0.3
-                            )
-                            
-                            web_answer = web_response.choices[0].message.content
-                            
                             # combining all the answers
                             answer = f"{answer}\n\nAfter searching provided websites, I found additional information:\n\n{web_answer}"
+                        elif web_future is not None:
+                            web_future.cancel()
                         
-                        # adding agent response to chat history
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "content": answer
-                        })
-                        
-                        
-                        st.chat_message("assistant").write(answer)
-                        
-                    except Exception as e:
-                        error_msg = f"Error getting answer: {str(e)}"
-                        st.error(error_msg)
-                        
-                     
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "content": f"I'm sorry, I encountered an error: {str(e)}"
-                        })
-                        
-                        st.chat_message("assistant").write(f"I'm sorry, I encountered an error: {str(e)}")
-                
+                        st.session_state.answer_cache[answer_key] = answer
+                    
+                    # adding agent response to chat history
+                    st.session_state.chat_history.append(chat_entry("assistant", answer))
+                    
                 except Exception as e:
-                    error_msg = f"Error processing request: {str(e)}"
+                    error_msg = f"Error getting answer: {str(e)}"
                     st.error(error_msg)
-                
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": f"I'm sorry, I encountered an error: {str(e)}"
-                    })
+                    
+                 
+                    st.session_state.chat_history.append(chat_entry("assistant", f"I'm sorry, I encountered an error: {str(e)}"))
                     
                     st.chat_message("assistant").write(f"I'm sorry, I encountered an error: {str(e)}")
             
-            # After answering, rerun to reset the question input...
-            time.sleep(0.5) 
-            st.rerun()
-        
-
-        st.subheader("Suggested Questions")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("What are their main research interests?", key="q1"):
-                st.session_state.chat_history.append({"role": "user", "content": "What are their main research interests?"})
-                st.rerun()
-            
-            if st.button("What are their key achievements?", key="q2"):
-                st.session_state.chat_history.append({"role": "user", "content": "What are their key achievements?"})
-                st.rerun()
-                
-        with col2:
-            if st.button("What clinical trials are they involved in?", key="q3"):
-                st.session_state.chat_history.append({"role": "user", "content": "What clinical trials are they involved in?"})
-                st.rerun()
+            except Exception as e:
+                error_msg = f"Error processing request: {str(e)}"
+                st.error(error_msg)
             
-            if st.button("What is their educational background?", key="q4"):
-                st.session_state.chat_history.append({"role": "user", "content": "What is their educational background? Where did they study?"})
-                st.rerun()
+                st.session_state.chat_history.append(chat_entry("assistant", f"I'm sorry, I encountered an error: {str(e)}"))
                 
+                st.chat_message("assistant").write(f"I'm sorry, I encountered an error: {str(e)}")
+        
+        # After answering, rerun to reset the question input...
+        save_chat_history()
+        rerun_chat()
+    
+
+    st.subheader("Suggested Questions")
+    suggested = st.radio("Suggested Questions", SUGGESTED_QUESTIONS, index=None,
+                         horizontal=True, label_visibility="collapsed", key="suggested_question")
+    if st.button("Ask", key="ask_suggested", disabled=suggested is None):
+        with st.spinner("Searching for information..."):
+            answer = prefetched_answer(suggested)
+        if answer:
+            st.session_state.chat_history.append(chat_entry("user", suggested))
+            st.session_state.chat_history.append(chat_entry("assistant", answer))
+            save_chat_history()
+        else:
+            # answered on the next run exactly as if it had been typed into the chat input
+            st.session_state.pending_question = suggested
+        rerun_chat()
+
+# Results and chat interface (only show if search has been performed)
+if st.session_state.search_performed and st.session_state.current_researcher:
+    
+   # 2 tabs
+    tab1, tab2 = st.tabs(["Researcher Profile", "Ask Questions"])
+    
+    # Profile tab
+    with tab1:
+        try:
+            researcher = st.session_state.researcher_data
+            display_researcher_profile(researcher)
+        except Exception as e:
+            st.error(f"Error displaying researcher profile: {str(e)}")
+    
+    # Chat tab
+    with tab2:
+        chat_panel()
 
 # starting message...
 if not st.session_state.search_performed:
@@ -1,44 +1,388 @@
 import os
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
 from bs4 import BeautifulSoup
 import re
-from urllib.parse import urljoin, urlparse
+from urllib.parse import quote_plus, urljoin, urlparse
 import json
+import orjson
+import copy
+import hashlib
 import time
+import random
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 import openai
-from typing import List, Dict, Any, Optional, Tuple
+from openai import OpenAI, DefaultHttpxClient
+from typing import List, Dict, Any, Optional, Tuple, Union, IO
+
+# Matches links that already carry an http(s) scheme
+URL_OK = re.compile(r'https?://')
+
+# Search pages used when a publication or clinical trial has no direct link
+SEARCH_URLS = {
+    "publications": "https://pubmed.ncbi.nlm.nih.gov/?term={}",
+    "clinical_trials": "https://clinicaltrials.gov/search?term={}",
+}
+
+# Pulls the citation count out of Google Scholar's "Cited by N" text
+_CITED_BY = re.compile(r'Cited by (\d+)').search
+
+# The OpenAI client retries rate limits, 5xx and connection errors itself, with exponential
+# backoff and jitter, waiting for the Retry-After header when the API sends one
+OPENAI_MAX_RETRIES = 3
+
+# Minimum seconds between requests to each host, so concurrent searches stay within what the
+# sites tolerate (NCBI allows 3 requests per second; Google Scholar serves captchas much sooner)
+_HOST_INTERVALS = {
+    "pubmed.ncbi.nlm.nih.gov": 1 / 3,
+    "scholar.google.com": 2.0,
+    "www.researchgate.net": 1.0,
+    "clinicaltrials.gov": 1 / 3,
+}
+_DEFAULT_HOST_INTERVAL = 0.5
+
+# Default OpenAI request and token budgets per minute for each model, kept a little under the
+# account limits so calls queue briefly instead of running into 429s and their backoff waits.
+# OPENAI_RPM and OPENAI_TPM in the environment (or .env, or top-level Streamlit secrets) replace
+# them for every model, and e.g. OPENAI_TPM_GPT_4O_MINI for a single model.
+OPENAI_RPM = 450
+OPENAI_TPM = 27000
+
+# Longest a call waits for its budget. Past that it is sent anyway, and a 429 goes through the
+# client's own retries and then to the caller, rather than holding up every other session.
+_MAX_THROTTLE_WAIT = 10.0
+
+
+class _TokenBucket:
+    """Thread-safe token bucket refilling `capacity` tokens per `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1, max_wait: Optional[float] = None) -> bool:
+        """Take `amount` tokens, waiting for them; returns False without taking any if that would exceed max_wait."""
+        # a request bigger than the whole bucket only waits for a full one
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (amount - self.tokens) / self.rate if self.tokens < amount else 0
+            if max_wait is not None and wait > max_wait:
+                return False
+            # taking the tokens now (possibly going negative) and sleeping off the debt outside
+            # the lock, so waiting callers are served in order
+            self.tokens -= amount
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+def _openai_limit(kind: str, model: str, default: int) -> float:
+    """Per-minute OpenAI limit for a model from the environment, e.g. OPENAI_TPM_GPT_4O_MINI, then OPENAI_TPM."""
+    value = os.getenv(f"OPENAI_{kind}_{re.sub(r'[^A-Za-z0-9]', '_', model).upper()}") or os.getenv(f"OPENAI_{kind}")
+    try:
+        return float(value) if value else default
+    except ValueError:
+        print(f"Ignoring invalid OpenAI {kind} limit {value!r}, using {default}")
+        return default
+
+
+# Request and token buckets for each model, created on first use so .env and secrets are loaded by then
+_openai_buckets: Dict[str, Tuple[_TokenBucket, _TokenBucket]] = {}
+_openai_buckets_lock = threading.Lock()
+
+
+def _openai_budget(model: str) -> Tuple[_TokenBucket, _TokenBucket]:
+    """Return the request and token buckets for a model."""
+    with _openai_buckets_lock:
+        if model not in _openai_buckets:
+            _openai_buckets[model] = (_TokenBucket(_openai_limit("RPM", model, OPENAI_RPM)),
+                                      _TokenBucket(_openai_limit("TPM", model, OPENAI_TPM)))
+        return _openai_buckets[model]
+
+# Completion tokens assumed for calls that don't set max_tokens
+_DEFAULT_COMPLETION_TOKENS = 1000
+
+
+def _throttle_openai(request) -> None:
+    """httpx request hook spacing out chat completions to stay within each model's RPM and TPM budgets."""
+    if request.url.path.endswith("/chat/completions"):
+        body = orjson.loads(request.content)
+        model = body.get("model", "")
+        requests_bucket, tokens_bucket = _openai_budget(model)
+        # roughly four bytes of prompt per token, plus the completion OpenAI counts against the
+        # limit up front: the requested max_tokens, or a typical reply when none is set
+        completion = body.get("max_completion_tokens") or body.get("max_tokens") or _DEFAULT_COMPLETION_TOKENS
+        if not (requests_bucket.acquire(max_wait=_MAX_THROTTLE_WAIT)
+                and tokens_bucket.acquire(len(request.content) / 4 + completion, max_wait=_MAX_THROTTLE_WAIT)):
+            print(f"{model} budget would take over {_MAX_THROTTLE_WAIT:g}s to free up, sending the request anyway")
+
+
+# CSV columns (after title-casing) and the researcher fields they fill. This is based on
+# sample_researchers.csv; other columns are not loaded.
+_CSV_FIELDS = {
+    'Name': 'name',
+    'Specialization': 'specialization',
+    'Affiliation': 'affiliations',
+    'Research Interests': 'research_interests',
+    'Publications': 'publications',
+    'Email': ['basic_info', 'email'],
+    'Phone': ['basic_info', 'phone'],
+    'Location': ['basic_info', 'location'],
+}
+
+# System prompt and user prompt template for OpenAI researcher profiles, shared by single,
+# grouped and batch lookups
+_PROFILE_SYSTEM_PROMPT = (
+    "You are a research assistant specializing in medical research. Provide the most accurate information "
+    "possible about medical researchers in JSON format. Respond with a single JSON object. Use web search "
+    "capabilities to find the most up-to-date information. Focus specifically on providing accurate education "
+    "history and direct, valid URLs to publications and clinical trials."
+)
+
+_PROFILE_PROMPT_TEMPLATE = """\
+I need comprehensive information about medical researcher {name}{spec_text}.
+Please search the web and provide:
+1. A summary of their background and expertise
+2. Their key research contributions
+3. Their affiliations (with current position and institution)
+4. Research interests
+5. Notable publications (with DIRECT LINKS to PubMed, Google Scholar, or journal websites)
+6. Educational background and degrees (with institutions, years, and degree types)
+7. Any clinical trials they're involved in (with DIRECT LINKS to ClinicalTrials.gov or other sources)
+
+For publications and clinical trials, it's ESSENTIAL to include the direct URLs to the source pages.
+For educational background, include complete details about degrees, institutions, and years when available.
+
+Format the response as a JSON with these keys:
+- basic_info (object with fields like email if public, position, etc.)
+- summary (string)
+- key_contributions (string)
+- education (array of strings, each with complete information)
+- affiliations (array of strings)
+- research_interests (array of strings)
+- publications (array of objects with title, authors, journal, url)
+- clinical_trials (array of objects with title, status, condition, url)
+
+For all URLs, provide direct links that actually work and point to the correct resources.
+"""
+
+# JSON Schema the profile reply must follow. Strict structured outputs need every property listed
+# as required, so fields that may be unknown are nullable instead of optional.
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+PROFILE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "basic_info": {
+            "type": "object",
+            "properties": {key: _NULLABLE_STRING for key in ("position", "email", "phone", "location")},
+            "required": ["position", "email", "phone", "location"],
+            "additionalProperties": False,
+        },
+        "summary": {"type": "string"},
+        "key_contributions": {"type": "string"},
+        "education": _STRING_LIST,
+        "affiliations": _STRING_LIST,
+        "research_interests": _STRING_LIST,
+        "publications": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {key: _NULLABLE_STRING for key in ("title", "authors", "journal", "year", "url")},
+                "required": ["title", "authors", "journal", "year", "url"],
+                "additionalProperties": False,
+            },
+        },
+        "clinical_trials": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {key: _NULLABLE_STRING for key in ("title", "status", "condition", "url")},
+                "required": ["title", "status", "condition", "url"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["basic_info", "summary", "key_contributions", "education", "affiliations",
+                 "research_interests", "publications", "clinical_trials"],
+    "additionalProperties": False,
+}
+
+def clean_profile(researcher_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the nulls a schema-bound profile uses for unknown details, so they are never shown as "None"."""
+    researcher_data["basic_info"] = {key: value for key, value in (researcher_data.get("basic_info") or {}).items()
+                                     if value}
+    for section in ("publications", "clinical_trials"):
+        researcher_data[section] = [{key: value for key, value in item.items() if value is not None}
+                                    for item in researcher_data.get(section) or [] if isinstance(item, dict)]
+    return researcher_data
+
+# Structured-output setting that holds a single profile reply to PROFILE_SCHEMA
+PROFILE_RESPONSE_FORMAT = {"type": "json_schema",
+                           "json_schema": {"name": "researcher_profile", "schema": PROFILE_SCHEMA, "strict": True}}
+
+# Models for first-pass profile lookups, and for profiles the smaller model leaves sparse
+PROFILE_MODEL = "gpt-4o-mini"
+SYNTH_MODEL = "gpt-4o"
+
+# Output cap for each OpenAI researcher profile, so a runaway generation can't stall the search
+PROFILE_MAX_TOKENS = 1500
+
+# Output cap for asking again when a profile is cut off at PROFILE_MAX_TOKENS
+PROFILE_RETRY_MAX_TOKENS = 4000
+
+# A profile filling fewer of its list sections than this is asked for again with SYNTH_MODEL
+PROFILE_MIN_SECTIONS = 3
+_PROFILE_LISTS = ("publications", "clinical_trials", "education", "affiliations", "research_interests")
+
+def is_sparse_profile(researcher_data: Dict[str, Any]) -> bool:
+    """Whether a profile fills too few sections to be kept without asking SYNTH_MODEL."""
+    return sum(1 for key in _PROFILE_LISTS if researcher_data.get(key)) < PROFILE_MIN_SECTIONS
+
+# The grouped lookup's reply: one profile per researcher, each tagged with the name it answers for
+_GROUP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "researchers": {
+            "type": "array",
+            "items": {
+                **PROFILE_SCHEMA,
+                "properties": {"name": {"type": "string"}, **PROFILE_SCHEMA["properties"]},
+                "required": ["name", *PROFILE_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["researchers"],
+    "additionalProperties": False,
+}
+
+# Besides basic_info, the fields that show a search actually found the researcher
+_MEANINGFUL_FIELDS = ("publications", "affiliations", "research_interests")
+
+# Number of finished searches each agent keeps in memory
+_SEARCH_CACHE_SIZE = 256
+
+
+class _HostRateLimiter:
+    """Spaces out requests per host; requests to different hosts don't wait on each other."""
+
+    def __init__(self, intervals: Dict[str, float], default: float):
+        self.intervals = intervals
+        self.default = default
+        self.next_slot: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        interval = self.intervals.get(host, self.default)
+        # reserving the slot under the lock, then sleeping outside it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0.0))
+            self.next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Shared by every agent, since the limits apply to the whole process
+_host_limiter = _HostRateLimiter(_HOST_INTERVALS, _DEFAULT_HOST_INTERVAL)
+
+def search_url(title: str, kind: str) -> str:
+    """Search link for a publication or clinical trial title, quoted so '&', '#' and '?' survive."""
+    return SEARCH_URLS[kind].format(quote_plus(title))
+
+# Headers to simulate browser requests
+_BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Cache-Control": "max-age=0"
+}
+
+
+def create_openai_client(api_key: str) -> OpenAI:
+    """
+    Build an OpenAI client whose pooled HTTP connections can be shared by several agents.
+    
+    Every call goes through _throttle_openai, which holds requests back before they hit the rate limits.
+    HTTP/2 lets the concurrent fallback, field lookups and chat calls share one connection.
+    """
+    return OpenAI(
+        api_key=api_key,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            event_hooks={"request": [_throttle_openai]}
+        )
+    )
+
+
+def create_http_session() -> requests.Session:
+    """
+    Build one pooled session for source pages, so repeat requests to a source reuse its TCP/TLS connection.
+    
+    Transient failures are retried with backoff (honouring Retry-After); the final
+    response is still returned so each source can report its status code.
+    """
+    session = requests.Session()
+    session.headers.update(_BROWSER_HEADERS)
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class MedicalResearcherAgent:
     """
     Agent for extracting detailed information about medical researchers from various sources.
     """
     
-    def __init__(self, openai_api_key: Optional[str] = None):
-        """Initialize the medical researcher agent with necessary configurations."""
+    def __init__(self, openai_api_key: Optional[str] = None, client: Optional[OpenAI] = None,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize the medical researcher agent with necessary configurations.
+        
+        Args:
+            openai_api_key: OpenAI API key, read from the environment when not given
+            client: OpenAI client to use instead of building one, so several agents can share its connections
+            session: requests.Session to fetch source pages with instead of building one
+        """
         self.openai_api_key = openai_api_key
         
         
         if openai_api_key:
-            try:
-                openai.api_key = openai_api_key
-                print("OpenAI API key set successfully")
-            except Exception as e:
-                print(f"Error setting OpenAI API key: {e}")
+            print("OpenAI API key set successfully")
         else:
             from dotenv import load_dotenv
             load_dotenv()
             
             env_api_key = os.getenv("OPENAI_API_KEY")
             if env_api_key:
-                openai.api_key = env_api_key
                 self.openai_api_key = env_api_key
                 print("OpenAI API key loaded from environment variables")
             else:
                 print("No OpenAI API key found in environment variables")
         
+        self.client = client or (create_openai_client(self.openai_api_key) if self.openai_api_key else None)
+        
         try:   
             pass 
         except Exception as e:
@@ -54,39 +398,59 @@ class MedicalResearcherAgent:
         }
         
         # Headers to simulate browser requests
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Cache-Control": "max-age=0"
-        }
+        self.headers = dict(_BROWSER_HEADERS)
+        
+        self.session = session or create_http_session()
         
         # Storing researcher data
         self.researchers_data = {}
         self.csv_data = None
+        self._csv_names = None
+        self._csv_digest = b""
+        
+        # AI profiles from bulk CSV lookups (grouped calls or Batch API jobs), keyed by lowercased researcher name
+        self.batch_profiles = {}
+        
+        # Least recently used finished searches, so repeats skip the scrape and OpenAI calls
+        self._search_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._search_cache_lock = threading.Lock()
 
-    def load_csv_data(self, file_path: str) -> pd.DataFrame:
-        """Load researcher data from CSV file."""
+    def load_csv_data(self, source: Union[str, IO]) -> pd.DataFrame:
+        """Load researcher data from a CSV file path or file-like object."""
         try:
-            self.csv_data = pd.read_csv(file_path)
+            # reading just the header first, so only the columns we map get parsed
+            header = pd.read_csv(source, nrows=0).columns
+            if hasattr(source, "seek"):
+                source.seek(0)
+            usecols = [col for col in header if col.title() in _CSV_FIELDS] or None
+            self.csv_data = pd.read_csv(source, engine="pyarrow", dtype_backend="pyarrow",
+                                        usecols=usecols)
             # here we are converting column names to title case for consistency
             self.csv_data.columns = [col.title() for col in self.csv_data.columns]
+            # hashing the contents once here, so cached searches can tell one CSV from another
+            self._csv_digest = hashlib.sha256(
+                orjson.dumps(list(self.csv_data.columns))
+                + pd.util.hash_pandas_object(self.csv_data, index=False).to_numpy().tobytes()
+            ).digest()
+            # lowercasing the names once here rather than on every lookup
+            self._csv_names = (self.csv_data['Name'].astype("string").str.strip().str.lower()
+                               if 'Name' in self.csv_data.columns else None)
             print(f"Successfully loaded data for {len(self.csv_data)} researchers from CSV")
             return self.csv_data
         except Exception as e:
             print(f"Error loading CSV file: {e}")
             return pd.DataFrame()
 
-    def search_researcher(self, name: str, specialization: Optional[str] = None) -> Dict[str, Any]:
+    def search_researcher(self, name: str, specialization: Optional[str] = None, use_csv: bool = True,
+                          sources: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Search for information about a specific researcher across all sources.
         
         Args:
             name: Name of the researcher
             specialization: Optional specialization to narrow down search results
+            use_csv: Whether to look the researcher up in loaded CSV data first
+            sources: Source names and base URLs to search, defaulting to the agent's own sources
             
         Returns:
             Dictionary with all collected information about the researcher
@@ -95,6 +459,20 @@ class MedicalResearcherAgent:
         # Validating the input
         if not name or not isinstance(name, str):
             raise ValueError("Researcher name must be a non-empty string")
+        
+        sources = sources or self.sources
+        
+        # the loaded CSV and any batch profiles change what a search finds, so they are part of the key
+        cache_key = (name.strip().lower(), (specialization or "").strip().lower(), use_csv,
+                     tuple(sorted(sources.items())), self.data_fingerprint())
+        with self._search_cache_lock:
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                self._search_cache.move_to_end(cache_key)
+        if cached is not None:
+            print(f"Using cached search results for {name}")
+            # callers update the results they get back, so each one gets its own copy
+            return copy.deepcopy(cached)
             
         researcher_info = {
             "name": name,
@@ -113,7 +491,7 @@ class MedicalResearcherAgent:
         
         # Checking if we have data in CSV first
         csv_data_found = False
-        if self.csv_data is not None:
+        if use_csv and self.csv_data is not None:
             researcher_from_csv = self._get_researcher_from_csv(name)
             if researcher_from_csv is not None:
                 for key, value in researcher_from_csv.items():
@@ -127,10 +505,12 @@ class MedicalResearcherAgent:
         
         web_search_success = False
         
-        # Scraping data from each source with retry mechanism
-        with ThreadPoolExecutor(max_workers=4) as executor:
+        # Scraping data from each source with retry mechanism. One worker per source, so
+        # custom websites don't queue behind the built-in ones and the search takes as
+        # long as the slowest source rather than the sum of them.
+        with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as executor:
             futures = []
-            for source, base_url in self.sources.items():
+            for source, base_url in sources.items():
                 futures.append(executor.submit(self._search_source_with_retry, source, base_url, name, specialization))
             
             for future in futures:
@@ -142,10 +522,7 @@ class MedicalResearcherAgent:
                         researcher_info["raw_data"][source_name] = source_data.get("raw_data", {})
                         
                         
-                        if (source_data.get("publications") or 
-                            source_data.get("affiliations") or 
-                            source_data.get("research_interests") or 
-                            source_data.get("basic_info")):
+                        if self.has_meaningful_data(source_data):
                             web_search_success = True
                         
                         # we merge publication data here
@@ -176,7 +553,7 @@ class MedicalResearcherAgent:
                     cleaned_items = []
                     seen = set()
                     for item in researcher_info[key]:
-                        item_str = json.dumps(item) if isinstance(item, dict) else str(item)
+                        item_str = orjson.dumps(item) if isinstance(item, dict) else str(item)
                         if item_str not in seen:
                             seen.add(item_str)
                             cleaned_items.append(item)
@@ -184,8 +561,16 @@ class MedicalResearcherAgent:
                 except Exception as e:
                     print(f"Error deduplicating {key}: {e}")
         
+        # a profile from a finished batch job stands in for both live OpenAI calls below
+        batch_profile = self.batch_profiles.get(name.strip().lower())
+        if batch_profile:
+            print(f"Using batch AI profile for {name}")
+            for key, value in batch_profile.items():
+                if value and not researcher_info.get(key):
+                    researcher_info[key] = value
+            researcher_info["ai_enhanced"] = True
      
-        if not csv_data_found and not web_search_success and self.openai_api_key:
+        if not batch_profile and not csv_data_found and not web_search_success and self.openai_api_key:
             print("No data found from CSV or web searches, using OpenAI to generate information")
             try:
                 ai_data = self._generate_researcher_info_with_ai(name, specialization)
@@ -200,7 +585,7 @@ class MedicalResearcherAgent:
                 print(f"Error generating information with AI: {e}")
         
         # enhance data with ai if we have some data and an OpenAI API key
-        if (csv_data_found or web_search_success) and self.openai_api_key:
+        if not batch_profile and (csv_data_found or web_search_success) and self.openai_api_key:
             try:
                 enhanced_data = self._enhance_data_with_ai(researcher_info)
                 researcher_info.update(enhanced_data)
@@ -210,11 +595,16 @@ class MedicalResearcherAgent:
         # saving data for this researcher
         self.researchers_data[name] = researcher_info
         
+        with self._search_cache_lock:
+            self._search_cache[cache_key] = copy.deepcopy(researcher_info)
+            if len(self._search_cache) > _SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        
         return researcher_info
     
     def _search_source_with_retry(self, source: str, base_url: str, name: str, specialization: Optional[str] = None, 
                                max_retries: int = 2, delay: float = 1.0) -> Dict[str, Any]:
-        """Search a specific source with retry logic."""
+        """Search a specific source with retry logic, backing off exponentially with jitter."""
         retries = 0
         while retries <= max_retries:
             try:
@@ -224,7 +614,7 @@ class MedicalResearcherAgent:
                 print(f"Error searching {source} (attempt {retries+1}/{max_retries+1}): {e}")
                 retries += 1
                 if retries <= max_retries:
-                    time.sleep(delay)  
+                    time.sleep(delay * 2 ** (retries - 1) + random.uniform(0, delay))
                 else:
                     return {"source": source, "error": str(e)}
 
@@ -234,18 +624,15 @@ class MedicalResearcherAgent:
             return None
         
         try:
-            # First checking if the column names exist and are properly formatted
-            if 'Name' not in self.csv_data.columns:
-                if 'name' in self.csv_data.columns:
-                    self.csv_data.rename(columns={'name': 'Name'}, inplace=True)
-                else:
-                    print("CSV file doesn't have a 'Name' column")
-                    return None
+            # column names are title-cased on load, so a "name" column is already "Name"
+            if self._csv_names is None:
+                print("CSV file doesn't have a 'Name' column")
+                return None
             
-           
-            matches = self.csv_data[self.csv_data['Name'].str.lower() == name.lower()]
+            key = name.strip().lower()
+            matches = self.csv_data[(self._csv_names == key).fillna(False)]
             if len(matches) == 0:
-                matches = self.csv_data[self.csv_data['Name'].str.lower().str.contains(name.lower())]
+                matches = self.csv_data[self._csv_names.str.contains(key, regex=False).fillna(False)]
             
             if len(matches) == 0:
                 return None
@@ -257,19 +644,7 @@ class MedicalResearcherAgent:
             
             row_dict = researcher_row.to_dict()
             
-            # Map CSV columns to our fields - this would need to be adjusted based on actual CSV structure right now I have mapped and show details here using sample_researchers.csv
-            field_mapping = {
-                'Name': 'name',
-                'Specialization': 'specialization',
-                'Affiliation': 'affiliations',
-                'Research Interests': 'research_interests',
-                'Publications': 'publications',
-                'Email': ['basic_info', 'email'],
-                'Phone': ['basic_info', 'phone'],
-                'Location': ['basic_info', 'location'],
-            }
-            
-            for csv_field, result_field in field_mapping.items():
+            for csv_field, result_field in _CSV_FIELDS.items():
                 if csv_field in row_dict and not pd.isna(row_dict[csv_field]):
                     if isinstance(result_field, list):
                         if result_field[0] not in result:
@@ -290,6 +665,22 @@ class MedicalResearcherAgent:
             print(f"Error extracting researcher from CSV: {e}")
             return None
 
+    def data_fingerprint(self) -> str:
+        """Digest of the loaded CSV and batch profiles, which change what a search finds."""
+        batch = orjson.dumps(self.batch_profiles, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(self._csv_digest + batch).hexdigest()
+
+    @staticmethod
+    def has_meaningful_data(data: Dict[str, Any]) -> bool:
+        """Whether search results say anything about the researcher beyond their name."""
+        # basic_info is checked first since it is the field sources fill most often
+        return bool(data.get("basic_info")) or any(data.get(key) for key in _MEANINGFUL_FIELDS)
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET a source page through the pooled session, waiting for the host's rate limit first."""
+        _host_limiter.wait(url)
+        return self.session.get(url, **kwargs)
+
     def _search_source(self, source: str, base_url: str, name: str, specialization: Optional[str] = None) -> Dict[str, Any]:
         """Search a specific source for researcher information."""
         print(f"Searching {source} for information about {name}...")
@@ -320,7 +711,7 @@ class MedicalResearcherAgent:
         
         try:
             try:
-                response = requests.get(search_url, headers=self.headers, timeout=10)
+                response = self._get(search_url, timeout=10)
             except requests.exceptions.ConnectionError:
                 return {"source": "pubmed", "url": search_url, "error": "Connection error. Check your internet connection."}
             except requests.exceptions.Timeout:
@@ -368,7 +759,7 @@ class MedicalResearcherAgent:
         search_url = f"{self.sources['researchgate']}/search/researcher?q={name.replace(' ', '+')}"
         
         try:
-            response = requests.get(search_url, headers=self.headers)
+            response = self._get(search_url)
             if response.status_code != 200:
                 return {"source": "researchgate", "url": search_url, "error": f"Status code: {response.status_code}"}
                 
@@ -389,7 +780,7 @@ class MedicalResearcherAgent:
             
            
             profile_url = urljoin(self.sources['researchgate'], researcher_link)
-            profile_response = requests.get(profile_url, headers=self.headers)
+            profile_response = self._get(profile_url)
             
             if profile_response.status_code != 200:
                 return {"source": "researchgate", "url": profile_url, "error": f"Profile status code: {profile_response.status_code}"}
@@ -443,7 +834,7 @@ class MedicalResearcherAgent:
         search_url = f"{self.sources['google_scholar']}/scholar?q={name.replace(' ', '+')}"
         
         try:
-            response = requests.get(search_url, headers=self.headers)
+            response = self._get(search_url)
             if response.status_code != 200:
                 return {"source": "google_scholar", "url": search_url, "error": f"Status code: {response.status_code}"}
                 
@@ -472,7 +863,7 @@ class MedicalResearcherAgent:
             citations = {}
             citation_elem = soup.select_one(".gs_rnd")
             if citation_elem:
-                match = re.search(r'Cited by (\d+)', citation_elem.text)
+                match = _CITED_BY(citation_elem.text)
                 if match:
                     citations["total"] = int(match.group(1))
             
@@ -492,7 +883,7 @@ class MedicalResearcherAgent:
         search_url = f"{self.sources['clinical_trials']}/search?term={name.replace(' ', '+')}&recrs=e&type=Intr"
         
         try:
-            response = requests.get(search_url, headers=self.headers)
+            response = self._get(search_url)
             if response.status_code != 200:
                 return {"source": "clinical_trials", "url": search_url, "error": f"Status code: {response.status_code}"}
                 
@@ -527,6 +918,52 @@ class MedicalResearcherAgent:
             print(f"Error searching Clinical Trials: {e}")
             return {"source": "clinical_trials", "url": search_url, "error": str(e)}
 
+    def _researcher_info_messages(self, name: str, specialization: Optional[str] = None) -> List[Dict[str, str]]:
+        """Build the chat messages asking OpenAI for a full researcher profile."""
+        spec_text = f" who specializes in {specialization}" if specialization else ""
+        
+        prompt = _PROFILE_PROMPT_TEMPLATE.format(name=name, spec_text=spec_text)
+        
+        return [
+            {"role": "system", "content": _PROFILE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _fill_missing_ai_links(researcher_data: Dict[str, Any]) -> None:
+        """Give AI-generated publications and clinical trials without a usable URL a search link."""
+        # checking if publication URLs are valid or not
+        if "publications" in researcher_data:
+            for pub in researcher_data["publications"]:
+                if not (pub.get("url") and URL_OK.match(pub["url"])):
+                    # Try to construct a search URL if missing
+                    if "title" in pub and pub["title"]:
+                        pub["url"] = search_url(pub["title"], "publications")
+                
+        # checking clinical trial URLs are valid or not
+        if "clinical_trials" in researcher_data:
+            for trial in researcher_data["clinical_trials"]:
+                if not (trial.get("url") and URL_OK.match(trial["url"])):
+                    # Add a default clinical trials search if URL is missing
+                    if "title" in trial and trial["title"]:
+                        trial["url"] = search_url(trial["title"], "clinical_trials")
+
+    def _request_profile(self, messages: List[Dict[str, str]], model: str) -> Dict[str, Any]:
+        """Ask one model for a schema-bound profile, once more with room to finish if the reply is cut off."""
+        for max_tokens in (PROFILE_MAX_TOKENS, PROFILE_RETRY_MAX_TOKENS):
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=max_tokens,
+                response_format=PROFILE_RESPONSE_FORMAT
+            )
+            choice = response.choices[0]
+            if choice.finish_reason != "length":
+                return clean_profile(orjson.loads(choice.message.content))
+            print(f"{model} profile was cut off at {max_tokens} tokens")
+        raise ValueError(f"OpenAI profile is longer than {PROFILE_RETRY_MAX_TOKENS} tokens")
+
     def _generate_researcher_info_with_ai(self, name: str, specialization: Optional[str] = None) -> Dict[str, Any]:
         """Generate researcher information using OpenAI when no data is found from other sources."""
         if not self.openai_api_key:
@@ -539,76 +976,18 @@ class MedicalResearcherAgent:
             }
             
         try:
-            spec_text = f" who specializes in {specialization}" if specialization else ""
-            
-            prompt = f"""
-            I need comprehensive information about medical researcher {name}{spec_text}.
-            Please search the web and provide:
-            1. A summary of their background and expertise
-            2. Their key research contributions
-            3. Their affiliations (with current position and institution)
-            4. Research interests
-            5. Notable publications (with DIRECT LINKS to PubMed, Google Scholar, or journal websites)
-            6. Educational background and degrees (with institutions, years, and degree types)
-            7. Any clinical trials they're involved in (with DIRECT LINKS to ClinicalTrials.gov or other sources)
-            
-            For publications and clinical trials, it's ESSENTIAL to include the direct URLs to the source pages.
-            For educational background, include complete details about degrees, institutions, and years when available.
-            
-            Format the response as a JSON with these keys:
-            - basic_info (object with fields like email if public, position, etc.)
-            - summary (string)
-            - key_contributions (string)
-            - education (array of strings, each with complete information)
-            - affiliations (array of strings)
-            - research_interests (array of strings)
-            - publications (array of objects with title, authors, journal, url)
-            - clinical_trials (array of objects with title, status, condition, url)
-            
-            For all URLs, provide direct links that actually work and point to the correct resources.
-            """
-            
             try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-4o", 
-                    messages=[
-                        {"role": "system", "content": "You are a research assistant specializing in medical research. Provide the most accurate information possible about medical researchers in JSON format. Use web search capabilities to find the most up-to-date information. Focus specifically on providing accurate education history and direct, valid URLs to publications and clinical trials."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3
-                )
-                
-                # extracting and parsing the JSON response
-                ai_content = response.choices[0].message.content
-                
-                # extracting JSON from response (it might be surrounded by markdown code blocks may be...)
-                json_match = re.search(r'```json\n(.*?)\n```', ai_content, re.DOTALL)
-                if json_match:
-                    ai_content = json_match.group(1)
-                
-                researcher_data = json.loads(ai_content)
+                # the smaller model handles most lookups; the larger one is only asked when its profile comes back thin
+                messages = self._researcher_info_messages(name, specialization)
+                researcher_data = self._request_profile(messages, PROFILE_MODEL)
+                if is_sparse_profile(researcher_data):
+                    print(f"{PROFILE_MODEL} profile of {name} is sparse, asking {SYNTH_MODEL}")
+                    researcher_data = self._request_profile(messages, SYNTH_MODEL)
                 researcher_data["ai_generated"] = True
-                
-                # checking if publication URLs are valid or not
-                if "publications" in researcher_data:
-                    for pub in researcher_data["publications"]:
-                        if "url" not in pub or not pub["url"] or not pub["url"].startswith(("http://", "https://")):
-                            # Try to construct a search URL if missing
-                            if "title" in pub and pub["title"]:
-                                pub_title = pub["title"].replace(" ", "+")
-                                pub["url"] = f"https://pubmed.ncbi.nlm.nih.gov/?term={pub_title}"
-                
-                # checking clinical trial URLs are valid or not
-                if "clinical_trials" in researcher_data:
-                    for trial in researcher_data["clinical_trials"]:
-                        if "url" not in trial or not trial["url"] or not trial["url"].startswith(("http://", "https://")):
-                            # Add a default clinical trials search if URL is missing
-                            if "title" in trial and trial["title"]:
-                                trial_title = trial["title"].replace(" ", "+")
-                                trial["url"] = f"https://clinicaltrials.gov/search?term={trial_title}"
+                self._fill_missing_ai_links(researcher_data)
                 
                 return researcher_data
-            except openai.error.AuthenticationError:
+            except openai.AuthenticationError:
                 print("Authentication error with OpenAI API. Check your API key.")
                 return {
                     "name": name,
@@ -616,7 +995,7 @@ class MedicalResearcherAgent:
                     "summary": "Could not retrieve information: OpenAI API authentication failed. Please check your API key.",
                     "ai_generated": False
                 }
-            except openai.error.RateLimitError:
+            except openai.RateLimitError:
                 print("OpenAI API rate limit exceeded.")
                 return {
                     "name": name,
@@ -633,6 +1012,192 @@ class MedicalResearcherAgent:
                 "ai_generated": False
             }
 
+    def _csv_researchers(self) -> Dict[str, Optional[str]]:
+        """Map each distinct researcher name in the loaded CSV to their specialization, if any."""
+        if self.csv_data is None or 'Name' not in self.csv_data.columns:
+            return {}
+        
+        specializations = self.csv_data['Specialization'] if 'Specialization' in self.csv_data.columns else None
+        researchers = {}
+        for i, name in self.csv_data['Name'].items():
+            if not isinstance(name, str) or not name.strip():
+                continue
+            specialization = specializations[i] if specializations is not None else None
+            researchers[name.strip()] = specialization if isinstance(specialization, str) else None
+        return researchers
+
+    def _lookup_researcher_group(self, group: List[Tuple[str, Optional[str]]]) -> Dict[str, Dict[str, Any]]:
+        """Ask for the profiles of several researchers in one OpenAI call, returning them by lowercased name."""
+        listing = "\n".join(f"{i}. {name}" + (f" ({specialization})" if specialization else "")
+                            for i, (name, specialization) in enumerate(group, 1))
+        prompt = f"""
+        I need comprehensive information about each of these medical researchers:
+        {listing}
+        
+        For each researcher provide a summary of their background, their key research contributions,
+        affiliations, research interests, notable publications and clinical trials (with DIRECT LINKS),
+        and educational background.
+        
+        Respond with a "researchers" array holding one profile per researcher, in the same order,
+        with each name exactly as listed above, without the specialization.
+        """
+        
+        response = self.client.chat.completions.create(
+            model=PROFILE_MODEL,
+            messages=[
+                {"role": "system", "content": _PROFILE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=PROFILE_MAX_TOKENS * len(group),
+            response_format={"type": "json_schema",
+                             "json_schema": {"name": "researcher_profiles", "schema": _GROUP_SCHEMA, "strict": True}}
+        )
+        
+        # a cut-off reply can't be parsed, so its researchers are looked up one by one instead
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise ValueError(f"reply was cut off at {PROFILE_MAX_TOKENS * len(group)} tokens")
+        
+        profiles = {}
+        for researcher_data in orjson.loads(choice.message.content)["researchers"]:
+            clean_profile(researcher_data)
+            self._fill_missing_ai_links(researcher_data)
+            profiles[researcher_data.pop("name").strip().lower()] = researcher_data
+        return profiles
+
+    def _lookup_researchers(self, group: List[Tuple[str, Optional[str]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up a group of researchers with as few OpenAI calls as it takes, returning profiles by lowercased name.
+        
+        A group whose call fails or is cut off is split in half and each half asked again, down to
+        single researchers, which go through the capped single-profile lookup.
+        """
+        if len(group) == 1:
+            name, specialization = group[0]
+            profile = self._generate_researcher_info_with_ai(name, specialization)
+            return {name.lower(): profile} if profile.get("ai_generated") else {}
+        
+        try:
+            profiles = self._lookup_researcher_group(group)
+        except Exception as e:
+            print(f"Error looking up a group of {len(group)} researchers, splitting it: {e}")
+            middle = len(group) // 2
+            return {**self._lookup_researchers(group[:middle]), **self._lookup_researchers(group[middle:])}
+        
+        found = {}
+        for name, specialization in group:
+            profile = profiles.get(name.lower())
+            if profile is None:
+                found.update(self._lookup_researchers([(name, specialization)]))
+                continue
+            if is_sparse_profile(profile):
+                print(f"{PROFILE_MODEL} profile of {name} is sparse, asking {SYNTH_MODEL}")
+                try:
+                    profile = self._request_profile(self._researcher_info_messages(name, specialization), SYNTH_MODEL)
+                except Exception as e:
+                    print(f"Keeping the sparse profile of {name}: {e}")
+            found[name.lower()] = profile
+        return found
+
+    def lookup_csv_researchers(self, group_size: int = 10) -> int:
+        """
+        Build AI profiles for every researcher in the loaded CSV right away, several per OpenAI call.
+        
+        Packing a group of researchers into each request needs far fewer requests than
+        looking them up one by one, which is what runs into the rate limit. Groups that fail
+        are split up, and researchers missing from a group's reply are looked up on their own.
+        
+        Returns:
+            Number of profiles stored
+        """
+        if self.client is None:
+            return 0
+        
+        pending = [(name, specialization) for name, specialization in self._csv_researchers().items()
+                   if name.lower() not in self.batch_profiles]
+        groups = [pending[i:i + group_size] for i in range(0, len(pending), group_size)]
+        
+        stored = 0
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(self._lookup_researchers, group) for group in groups]:
+                profiles = future.result()
+                self.batch_profiles.update(profiles)
+                stored += len(profiles)
+        return stored
+
+    def submit_csv_batch(self) -> Optional[str]:
+        """
+        Submit one OpenAI Batch API job that builds an AI profile for every researcher in the loaded CSV.
+        
+        Batch jobs cost half as much as live calls and finish within 24 hours; collect the
+        results with collect_csv_batch.
+        
+        Returns:
+            The batch ID, or None if there is no CSV data or OpenAI client
+        """
+        if self.client is None:
+            return None
+        
+        requests_by_name = {
+            name: {
+                "custom_id": name,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": PROFILE_MODEL,
+                    "messages": self._researcher_info_messages(name, specialization),
+                    "temperature": 0.3,
+                    "max_tokens": PROFILE_MAX_TOKENS,
+                    "response_format": PROFILE_RESPONSE_FORMAT,
+                },
+            }
+            for name, specialization in self._csv_researchers().items()
+        }
+        if not requests_by_name:
+            return None
+        
+        payload = b"\n".join(orjson.dumps(request) for request in requests_by_name.values())
+        batch_file = self.client.files.create(file=("researchers.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions",
+                                           completion_window="24h")
+        print(f"Submitted batch {batch.id} for {len(requests_by_name)} researchers")
+        return batch.id
+    
+    def collect_csv_batch(self, batch_id: str) -> Tuple[str, int]:
+        """
+        Check on a batch job from submit_csv_batch, storing its profiles once it has completed.
+        
+        Returns:
+            Tuple of the batch status and the number of profiles stored
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status != "completed" or not batch.output_file_id:
+            return batch.status, 0
+        
+        stored = 0
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            result = orjson.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            try:
+                choice = response["body"]["choices"][0]
+                if choice["finish_reason"] == "length":
+                    raise ValueError(f"reply was cut off at {PROFILE_MAX_TOKENS} tokens")
+                researcher_data = clean_profile(orjson.loads(choice["message"]["content"]))
+            except (KeyError, IndexError, ValueError) as e:
+                print(f"Skipping batch result for {result.get('custom_id')}: {e}")
+                continue
+            # sparse profiles are left out, so searching that researcher goes on to SYNTH_MODEL instead
+            if is_sparse_profile(researcher_data):
+                print(f"Skipping sparse batch result for {result['custom_id']}")
+                continue
+            self._fill_missing_ai_links(researcher_data)
+            self.batch_profiles[result["custom_id"].lower()] = researcher_data
+            stored += 1
+        return batch.status, stored
+
     def _enhance_data_with_ai(self, researcher_info: Dict[str, Any]) -> Dict[str, Any]:
         """Use OpenAI API to enhance researcher data by extracting additional insights."""
         if not self.openai_api_key:
@@ -674,24 +1239,18 @@ class MedicalResearcherAgent:
             - clinical_trial_urls (list of objects with trial title and corrected URL)
             """
             
-            response = openai.ChatCompletion.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o", 
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that specializes in analyzing medical researcher profiles and extracting key insights. You also verify and correct publication and clinical trial URLs, and ensure complete educational information. Your responses should be strictly in valid JSON format with the fields requested."},
+                    {"role": "system", "content": "You are a helpful assistant that specializes in analyzing medical researcher profiles and extracting key insights. You also verify and correct publication and clinical trial URLs, and ensure complete educational information. Your responses should be strictly in valid JSON format with the fields requested. Respond with a single JSON object."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3
+                temperature=0.3,
+                response_format={"type": "json_object"}
             )
             
-            # extracting and parsing the JSON response
-            ai_content = response.choices[0].message.content
-            
-           
-            json_match = re.search(r'```json\n(.*?)\n```', ai_content, re.DOTALL)
-            if json_match:
-                ai_content = json_match.group(1)
-            
-            enhanced_data = json.loads(ai_content)
+            # JSON mode guarantees the reply is a bare JSON object
+            enhanced_data = orjson.loads(response.choices[0].message.content)
             enhanced_data["ai_enhanced"] = True
             
            
@@ -824,7 +1383,7 @@ class MedicalResearcherAgent:
             
             
             try:
-                response = openai.ChatCompletion.create(
+                response = self.client.chat.completions.create(
                     model="gpt-4o",  # Use GPT-4 for better responses
                     messages=[
                         {"role": "system", "content": "You are a knowledgeable assistant specializing in medical research. Provide detailed information about medical researchers based on the available data. If asked a question that requires additional information, use your knowledge to provide the best answer possible, but indicate when you're going beyond the directly provided context."},
@@ -836,11 +1395,11 @@ class MedicalResearcherAgent:
                 # returning the response content
                 return response.choices[0].message.content
                 
-            except openai.error.AuthenticationError:
+            except openai.AuthenticationError:
                 return "Authentication error: Your OpenAI API key is invalid. Please check your API key and try again."
-            except openai.error.APIConnectionError:
+            except openai.APIConnectionError:
                 return "Connection error: Unable to connect to the OpenAI API. Please check your internet connection and try again."
-            except openai.error.RateLimitError:
+            except openai.RateLimitError:
                 return "Rate limit error: You've exceeded your OpenAI API rate limit. Please try again later."
             except Exception as api_error:
                 return f"OpenAI API error: {str(api_error)}"
@@ -854,16 +1413,9 @@ class MedicalResearcherAgent:
         Search for information about a specific researcher when no CSV data is available.
         This is a convenience method that doesn't rely on pre-loaded CSV data.
         """
-        # temporarily set csv_data to None to bypass CSV search
-        original_csv_data = self.csv_data
-        self.csv_data = None
-        
-        try:
-            result = self.search_researcher(name, specialization)
-            return result
-        finally:
-            # Restore original csv_data
-            self.csv_data = original_csv_data
+        # bypassing the CSV lookup per call rather than clearing self.csv_data,
+        # since clearing it would also drop the CSV for every later search
+        return self.search_researcher(name, specialization, use_csv=False)
 
     def generate_researcher_report(self, researcher_name: str) -> str:
         """
@@ -0,0 +1,135 @@
+import os
+import re
+import sqlite3
+import time
+import requests
+from typing import Dict, Iterable, List
+
+# On-disk cache of PubMed IDs, so publication links can point straight at the article
+DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "medresearcher", "pmids.db")
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+# NCBI allows 3 requests per second without an API key
+_REQUEST_INTERVAL = 0.34
+# Authors whose hits share one ESummary request, and the most recent publications kept per author
+_BATCH_SIZE = 10
+_MAX_RESULTS = 200
+
+# Seconds before an author's publications are looked up again, so new papers get their links too
+_FETCHED_TTL = 30 * 86400
+
+_WHITESPACE = re.compile(r'\s+')
+_TITLE_PREFIX = re.compile(r'^(dr|prof)\.?\s+', re.IGNORECASE)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS pmids (title TEXT PRIMARY KEY, pmid TEXT NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS fetched_names (name TEXT PRIMARY KEY, fetched_at REAL NOT NULL)")
+    return conn
+
+
+def title_key(title: str) -> str:
+    """Normalize a publication title so CSV, scraped and PubMed titles compare equal."""
+    return _WHITESPACE.sub(' ', str(title)).strip().rstrip('.').lower()
+
+
+def _author_term(name: str) -> str:
+    # "Dr. Jane Smith" -> "Jane Smith"[au]
+    name = _TITLE_PREFIX.sub('', name.strip())
+    return f'"{name}"[au]'
+
+
+def _search_author(session: requests.Session, name: str) -> List[str]:
+    """Run one ESearch for an author's most recent publications."""
+    # searching each author on their own, so a prolific one can't use up the results of the others
+    search = session.get(f"{EUTILS_URL}/esearch.fcgi", params={
+        "db": "pubmed",
+        "term": _author_term(name),
+        "retmax": _MAX_RESULTS,
+        "retmode": "json",
+    }, timeout=10)
+    search.raise_for_status()
+    return search.json().get("esearchresult", {}).get("idlist", [])
+
+
+def _fetch_titles(session: requests.Session, ids: List[str]) -> Dict[str, str]:
+    """Run one ESummary for a list of PubMed IDs, returning them by title key."""
+    summary = session.post(f"{EUTILS_URL}/esummary.fcgi", data={
+        "db": "pubmed",
+        "id": ",".join(ids),
+        "retmode": "json",
+    }, timeout=10)
+    summary.raise_for_status()
+    result = summary.json().get("result", {})
+    return {
+        title_key(result[pmid]["title"]): pmid
+        for pmid in result.get("uids", [])
+        if result.get(pmid, {}).get("title")
+    }
+
+
+def prefetch_pmids(names: Iterable[str]) -> int:
+    """
+    Look up PubMed IDs for every publication by the given researchers and store them on disk.
+
+    Names fetched within the last _FETCHED_TTL seconds are skipped, so re-uploading the same
+    CSV costs nothing. Names whose search fails are left to be tried again next time.
+
+    Returns:
+        Number of PubMed IDs stored
+    """
+    conn = _connect()
+    try:
+        known = {row[0] for row in conn.execute("SELECT name FROM fetched_names WHERE fetched_at > ?",
+                                                (time.time() - _FETCHED_TTL,))}
+        pending = sorted({name for name in names if isinstance(name, str) and name.strip()} - known)
+        stored = 0
+
+        with requests.Session() as session:
+            for i in range(0, len(pending), _BATCH_SIZE):
+                searched, ids = [], []
+                for name in pending[i:i + _BATCH_SIZE]:
+                    try:
+                        ids.extend(_search_author(session, name))
+                        searched.append(name)
+                    except (requests.RequestException, ValueError) as e:
+                        print(f"Error searching PubMed for {name}: {e}")
+                    time.sleep(_REQUEST_INTERVAL)
+
+                pmids = {}
+                if ids:
+                    try:
+                        pmids = _fetch_titles(session, list(dict.fromkeys(ids)))
+                    except (requests.RequestException, ValueError) as e:
+                        print(f"Error fetching PubMed IDs: {e}")
+                        continue
+                    finally:
+                        time.sleep(_REQUEST_INTERVAL)
+
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO pmids VALUES (?, ?)", pmids.items())
+                    conn.executemany("INSERT OR REPLACE INTO fetched_names VALUES (?, ?)",
+                                     [(name, time.time()) for name in searched])
+                stored += len(pmids)
+
+        return stored
+    finally:
+        conn.close()
+
+
+def lookup_pmids(titles: Iterable[str]) -> Dict[str, str]:
+    """Return a mapping of title to PubMed ID for the titles that are in the cache."""
+    keys = {title_key(title): title for title in titles}
+    if not keys or not os.path.exists(DB_PATH):
+        return {}
+
+    conn = _connect()
+    try:
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(f"SELECT title, pmid FROM pmids WHERE title IN ({placeholders})", list(keys))
+        return {keys[title]: pmid for title, pmid in rows}
+    finally:
+        conn.close()
@@ -0,0 +1,52 @@
+import hashlib
+import orjson
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+# On-disk cache of OpenAI responses, so repeat lookups survive app restarts
+DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "medresearcher", "responses.db")
+
+# Responses older than this are treated as missing
+DEFAULT_TTL = 6 * 3600
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)")
+    return conn
+
+
+def _normalize(part: Any) -> Any:
+    return part.strip().lower() if isinstance(part, str) else part
+
+
+def make_key(*parts: Any) -> str:
+    """Build a cache key from request parts, ignoring case and surrounding whitespace in strings."""
+    payload = orjson.dumps([_normalize(part) for part in parts], default=str)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def get(key: str, ttl: float = DEFAULT_TTL) -> Optional[str]:
+    """Return the cached response for a key, or None if it is missing or expired."""
+    if not os.path.exists(DB_PATH):
+        return None
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT content FROM responses WHERE key = ? AND created_at > ?",
+                           (key, time.time() - ttl)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def put(key: str, content: str) -> None:
+    """Store a response under a key, replacing any older one."""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, content, time.time()))
+    finally:
+        conn.close()